@@ -0,0 +1,197 @@
+# analytics.py
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from pdf_extractor import BASE_COLUMNS, split_subject_column
+
+# Grades in report order, best first, and the ones that fail a subject
+GRADE_ORDER = ("O", "A+", "A", "B+", "B", "C+", "C", "D", "E", "F", "FFF")
+FAIL_GRADES = ("F", "FFF")
+
+# Components of a subject: its main result line and its Term Work ("_TW") line
+THEORY, TERM_WORK = "Theory", "Term Work"
+COMPONENTS = (THEORY, TERM_WORK)
+
+MARK_PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+TOPPERS = 10
+
+
+def numeric_values(values):
+    """Marks or points as floats: the '*' grace marker is dropped, '---', 'N/A' and blanks become NaN"""
+    values = pd.Series(values, dtype="string")
+    return pd.to_numeric(values.str.lstrip("*"), errors="coerce").astype(float)
+
+
+class ResultAnalytics:
+    """Statistics over one extracted result sheet (a build_students_frame DataFrame).
+
+    Everything is computed column-wise with pandas/numpy, never row by row,
+    and each table is worked out on first access and then kept, so one
+    instance per dataset serves every rerun of the UI and the export.
+    """
+
+    def __init__(self, df):
+        self.df = df
+
+    @cached_property
+    def sgpa(self):
+        """SGPA per student as floats; '-----' (no SGPA awarded) becomes NaN"""
+        if "SGPA" not in self.df:
+            return pd.Series(np.nan, index=self.df.index, dtype=float)
+        return pd.Series(numeric_values(self.df["SGPA"]).to_numpy(), index=self.df.index)
+
+    @cached_property
+    def results(self):
+        """Long table with one row per student per subject line taken: student
+        (row position in df), Subject, Component, Attempt, Grade and Marks (the total).
+
+        Term Work lines are listed under their base subject code with
+        Component "Term Work"; repeated subjects (numbered columns) are
+        separate attempts.
+        """
+        grade_columns = {}
+        total_columns = {}
+        for column in self.df.columns:
+            if column in BASE_COLUMNS:
+                continue
+            parts = split_subject_column(column)
+            if parts is None:
+                continue
+            subject, field, repeat = parts
+            if field == "_GRD":
+                grade_columns[subject, repeat] = column
+            elif field == "_TOT":
+                total_columns[subject, repeat] = column
+
+        attempts = sorted(grade_columns.keys() | total_columns.keys())
+        n_students, n_attempts = len(self.df), len(attempts)
+        # reindex turns a missing column into all-NaN, so grades and totals line up
+        grades = self.df.reindex(columns=[grade_columns.get(a) for a in attempts]).to_numpy(dtype=object)
+        totals = self.df.reindex(columns=[total_columns.get(a) for a in attempts]).to_numpy(dtype=object)
+
+        term_work = [subject.endswith("_TW") for subject, _ in attempts]
+        subjects = [subject[:-3] if is_tw else subject for (subject, _), is_tw in zip(attempts, term_work)]
+        components = pd.Categorical([TERM_WORK if is_tw else THEORY for is_tw in term_work], categories=COMPONENTS)
+        results = pd.DataFrame({
+            "student": np.repeat(np.arange(n_students), n_attempts),
+            "Subject": np.tile(np.array(subjects, dtype=object), n_students),
+            "Component": pd.Categorical.from_codes(np.tile(components.codes, n_students), categories=COMPONENTS),
+            "Attempt": np.tile(np.array([repeat for _, repeat in attempts], dtype=np.int64), n_students),
+            "Grade": grades.ravel(),
+            "Marks": numeric_values(totals.ravel()).to_numpy(),
+        })
+        results["Grade"] = results["Grade"].where(results["Grade"].isin(GRADE_ORDER))
+        # Drop the cells of subjects a student didn't take
+        taken = pd.notna(grades.ravel()) | pd.notna(totals.ravel())
+        return results[taken].reset_index(drop=True)
+
+    @cached_property
+    def failed_subjects(self):
+        """Number of failed subjects per student; failing the theory and the Term Work
+        of one subject (attempt) is one failed subject"""
+        results = self.results
+        failed = results.loc[results["Grade"].isin(FAIL_GRADES), ["student", "Subject", "Attempt"]]
+        failed = failed.drop_duplicates()["student"].to_numpy()
+        return pd.Series(np.bincount(failed, minlength=len(self.df)), index=self.df.index)
+
+    @cached_property
+    def subject_summary(self):
+        """Per subject and component: students, passed, failed, pass rate (%), and mean,
+        min, percentiles and max of the total marks"""
+        results = self.results
+        keys = [results["Subject"], results["Component"]]
+        by_subject = results.groupby(keys, sort=True, observed=True)
+        graded = results["Grade"].notna()
+        failed = results["Grade"].isin(FAIL_GRADES)
+
+        summary = pd.DataFrame({
+            "Students": by_subject.size(),
+            "Passed": (graded & ~failed).groupby(keys, observed=True).sum(),
+            "Failed": failed.groupby(keys, observed=True).sum(),
+        })
+        summary["Pass Rate (%)"] = (100 * summary["Passed"] / (summary["Passed"] + summary["Failed"])).round(1)
+
+        marks = by_subject["Marks"]
+        summary["Mean Marks"] = marks.mean().round(1)
+        summary["Min Marks"] = marks.min()
+        percentiles = marks.quantile(list(MARK_PERCENTILES)).unstack(-1).reindex(columns=list(MARK_PERCENTILES))
+        for q in MARK_PERCENTILES:
+            summary[f"P{round(q * 100)} Marks"] = percentiles[q]
+        summary["Max Marks"] = marks.max()
+
+        # Subject topper: the first student with the highest total
+        best = (results.dropna(subset=["Marks"])
+                .sort_values(["Subject", "Component", "Marks"], ascending=[True, True, False], kind="stable")
+                .drop_duplicates(["Subject", "Component"]).set_index(["Subject", "Component"])["student"])
+        for column in ("PRN", "Name"):
+            if column in self.df:
+                summary[f"Topper {column}"] = pd.Series(self.df[column].to_numpy()[best.to_numpy()], index=best.index)
+        return summary.reset_index()
+
+    @cached_property
+    def grade_distribution(self):
+        """Students per grade for every subject and component, grades in GRADE_ORDER"""
+        results = self.results
+        grades = pd.Categorical(results["Grade"], categories=GRADE_ORDER)
+        table = pd.crosstab([results["Subject"], results["Component"]], grades, dropna=False)
+        # Only the subject lines that occur: dropna=False lists every component of every subject
+        taken = pd.MultiIndex.from_frame(results[["Subject", "Component"]].drop_duplicates()).sort_values()
+        table = table.reindex(index=taken, columns=list(GRADE_ORDER), fill_value=0)
+        return table.rename_axis(index=["Subject", "Component"], columns=None).reset_index()
+
+    @cached_property
+    def backlog_distribution(self):
+        """Number of students by how many subjects they failed"""
+        counts = self.failed_subjects.value_counts().sort_index()
+        return pd.DataFrame({"Failed Subjects": counts.index, "Students": counts.to_numpy()})
+
+    def toppers(self, n=TOPPERS):
+        """The n students with the highest SGPA (ties keep sheet order)"""
+        top = self.sgpa.dropna().sort_values(ascending=False, kind="stable").head(n)
+        columns = [col for col in ("PRN", "Seat No", "Name") if col in self.df]
+        table = self.df.loc[top.index, columns].reset_index(drop=True)
+        table.insert(0, "Rank", np.arange(1, len(table) + 1))
+        table["SGPA"] = top.to_numpy()
+        table["Failed Subjects"] = self.failed_subjects.loc[top.index].to_numpy()
+        return table
+
+    @cached_property
+    def overview(self):
+        """Headline figures for the whole sheet"""
+        sgpa = self.sgpa.dropna()
+        taken_any = np.bincount(self.results["student"].to_numpy(), minlength=len(self.df)) > 0
+        failed_any = (self.failed_subjects > 0).to_numpy()
+        return {
+            "students": len(self.df),
+            "subjects": self.results["Subject"].nunique(),
+            "average_sgpa": float(sgpa.mean()) if not sgpa.empty else None,
+            "median_sgpa": float(sgpa.median()) if not sgpa.empty else None,
+            "students_passed": int((taken_any & ~failed_any).sum()),
+            "students_with_backlogs": int(failed_any.sum()),
+            "pass_rate": float(100 * (taken_any & ~failed_any).sum() / taken_any.sum()) if taken_any.any() else None,
+        }
+
+    def summary_sheets(self):
+        """Sheet name -> DataFrame for the statistics pages of an Excel export"""
+        labels = {
+            "students": "Students",
+            "subjects": "Subjects",
+            "average_sgpa": "Average SGPA",
+            "median_sgpa": "Median SGPA",
+            "students_passed": "Students passed in all subjects",
+            "students_with_backlogs": "Students with backlogs",
+            "pass_rate": "Pass rate (%)",
+        }
+        overview = pd.DataFrame({
+            "Statistic": [labels[key] for key in labels],
+            "Value": [None if self.overview[key] is None else round(self.overview[key], 2) for key in labels],
+        })
+        return {
+            "Summary": overview,
+            "Subjects": self.subject_summary,
+            "Grades": self.grade_distribution,
+            "Toppers": self.toppers(),
+            "Backlogs": self.backlog_distribution,
+        }
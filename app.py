@@ -1,14 +1,21 @@
 import streamlit as st
 import pandas as pd
-import os
-import time
-import base64
+import json
+import threading
+from collections import OrderedDict
 from io import BytesIO
-import tempfile
 import plotly.express as px
 
 # Import backend functions
-from pdf_extractor import extract_tables_from_pdf, save_to_excel
+from pdf_extractor import build_students_frame, write_frame_to_excel
+from analytics import ResultAnalytics
+from extraction_cache import get_default_cache, hash_pdf
+from job_queue import JobManager, QueueFullError
+from result_store import ResultStore
+from debug_utils import metrics, setup_logging
+
+# File logging is off unless APP_LOG_LEVEL is set (see debug_utils)
+setup_logging()
 
 # Set page configuration
 st.set_page_config(
@@ -63,106 +70,143 @@ st.markdown("""
         margin-bottom: 1rem;
         box-shadow: 0 2px 5px rgba(0,0,0,0.1);
     }
-    .download-btn {
-        background-color: #4CAF50;
-        color: white;
-        padding: 0.5rem 1rem;
-        text-decoration: none;
-        border-radius: 0.3rem;
-        font-weight: bold;
-        display: inline-block;
-        margin-top: 1rem;
-    }
-    .download-btn:hover {
-        background-color: #45a049;
-        color: white;
-    }
 </style>
 """, unsafe_allow_html=True)
 
-# Modified get_excel_download_link function
-def get_excel_download_link(df, filename="students_data.xlsx"):
-    """Generate a download link for the excel file"""
-    output = BytesIO()
-    
-    # Use the context manager approach which handles the saving properly
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='StudentData')
-    
-    processed_data = output.getvalue()
-    b64 = base64.b64encode(processed_data).decode()
-    href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="{filename}" class="download-btn">Download Excel File</a>'
-    return href
+# Streamlit reruns the whole script on every interaction, so anything derived
+# from an upload is memoised under the SHA-256 of the PDF bytes. getvalue()
+# returns the upload's own buffer without copying it, so the upload is hashed
+# and handed to the job queue straight from memory.
+def get_upload_hash(uploaded_file):
+    """Content hash of an uploaded file, computed once per upload"""
+    hashes = st.session_state.setdefault('upload_hashes', {})
+    if uploaded_file.file_id not in hashes:
+        hashes.clear()
+        hashes[uploaded_file.file_id] = hash_pdf(uploaded_file.getvalue())
+    return hashes[uploaded_file.file_id]
 
-# Animated progress function
-def progress_bar_with_animation(text, num_steps=10):
-    """Display an animated progress bar"""
-    progress_text = st.empty()
-    progress_bar = st.progress(0)
-    
-    for i in range(num_steps+1):
-        progress_text.text(f"{text} ({i*10}%)")
-        progress_bar.progress(i/num_steps)
-        time.sleep(0.1)
+# Number of Excel exports kept in memory across reruns and sessions
+EXCEL_CACHE_ENTRIES = 8
+
+@st.cache_resource
+def get_excel_exports():
+    """Shared LRU of Excel exports keyed by PDF content hash"""
+    return OrderedDict(), threading.Lock()
+
+def get_excel_bytes(exports, file_hash, df, analytics):
+    """Excel file for df plus the statistics sheets, written once per PDF content hash"""
+    store, lock = exports
+    with lock:
+        if file_hash in store:
+            store.move_to_end(file_hash)
+            return store[file_hash]
     
-    progress_text.empty()
-    progress_bar.empty()
+    # Write-only workbook: rows are serialised as they go instead of building
+    # a full in-memory openpyxl sheet
+    output = BytesIO()
+    write_frame_to_excel(df, output, sheet_name='StudentData', extra_frames=analytics.summary_sheets())
+    data = output.getvalue()
+    with lock:
+        store[file_hash] = data
+        while len(store) > EXCEL_CACHE_ENTRIES:
+            store.popitem(last=False)
+    return data
+
+def show_excel_download(file_hash, df, analytics, filename="students_data.xlsx"):
+    """Download button that only builds the Excel file when clicked"""
+    exports = get_excel_exports()
+    st.download_button(
+        "Download Excel File",
+        data=lambda: get_excel_bytes(exports, file_hash, df, analytics),
+        file_name=filename,
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        on_click="ignore",
+        type="primary",
+    )
+
+# Share of the progress bar given to each stage reported by the backend
+PROGRESS_STAGES = {
+    "extracting": (0.0, 0.9),
+    "cached": (0.0, 0.9),
+    "building": (0.9, 0.95),
+    "writing": (0.95, 1.0),
+}
 
-# Function to create a placeholder animation while processing
-def processing_animation():
-    """Show processing animation"""
-    with st.spinner("Processing your PDF file..."):
-        col1, col2, col3 = st.columns([1, 3, 1])
-        with col2:
-            processing_placeholder = st.empty()
-            for i in range(5):
-                for dots in ["⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"]:
-                    processing_placeholder.markdown(f"<div style='text-align: center; font-size: 2rem;'>Processing {dots}</div>", unsafe_allow_html=True)
-                    time.sleep(0.1)
-            processing_placeholder.empty()
+# Progress text for a stage reported by the backend
+def describe_progress(stage, done, total, students_found):
+    """Return the progress bar fraction and message for a progress report"""
+    start, end = PROGRESS_STAGES.get(stage, (0.0, 1.0))
+    fraction = min(1.0, start + (end - start) * (done / total if total else 1.0))
+    if stage == "extracting":
+        text = f"Extracting student information: page {done} of {total} ({students_found} students found)"
+    elif stage == "cached":
+        text = f"Loaded {students_found} students from cache"
+    elif stage == "building":
+        text = f"Organising data for {students_found} students"
+    elif stage == "writing":
+        text = f"Creating Excel file ({done} of {total} students)"
+    else:
+        text = "Starting extraction..."
+    return fraction, text
+
+# One process pool for every session; extraction never runs in the script thread
+@st.cache_resource
+def get_job_manager():
+    """Shared background extraction queue"""
+    return JobManager()
+
+# Every processed PDF is also saved to the SQLite result store, which backs
+# the search across exams and semesters
+@st.cache_resource
+def get_result_store():
+    """Shared result store (see result_store.RESULT_STORE_PATH)"""
+    return ResultStore()
+
+# Analytics are built once per PDF and shared by every rerun, session and the
+# Excel export; each table inside is computed on first use (the leading
+# underscore keeps Streamlit from hashing the DataFrame; file_hash is the key)
+@st.cache_resource(show_spinner=False, max_entries=32)
+def get_analytics(file_hash, _df):
+    """ResultAnalytics for an extracted sheet"""
+    return ResultAnalytics(_df)
 
 # Function to show statistics
-def show_statistics(df):
+def show_statistics(analytics):
     """Display statistics about the extracted data"""
     st.markdown("<h3 class='sub-header'>📈 Data Statistics</h3>", unsafe_allow_html=True)
+    overview = analytics.overview
     
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.markdown("<div class='stats-card'>", unsafe_allow_html=True)
-        st.metric("Total Students", len(df))
+        st.metric("Total Students", overview["students"])
         st.markdown("</div>", unsafe_allow_html=True)
     
     with col2:
         st.markdown("<div class='stats-card'>", unsafe_allow_html=True)
-        # Handle SGPA calculation more carefully
-        try:
-            # Convert SGPA to numeric, coercing errors to NaN
-            numeric_sgpa = pd.to_numeric(df['SGPA'].replace('-----', pd.NA), errors='coerce')
-            # Calculate mean only if there are valid values
-            if not numeric_sgpa.isna().all():
-                avg_sgpa = numeric_sgpa.mean()
-                st.metric("Average SGPA", f"{avg_sgpa:.2f}")
-            else:
-                st.metric("Average SGPA", "N/A")
-        except Exception as e:
+        if overview["average_sgpa"] is not None:
+            st.metric("Average SGPA", f"{overview['average_sgpa']:.2f}")
+        else:
             st.metric("Average SGPA", "N/A")
-            print(f"SGPA calculation error: {str(e)}")
         st.markdown("</div>", unsafe_allow_html=True)
     
     with col3:
         st.markdown("<div class='stats-card'>", unsafe_allow_html=True)
-        # Get all subject columns that contain grades
-        grade_cols = [col for col in df.columns if '_GRD' in col]
-        total_subjects = len(grade_cols)
-        st.metric("Total Subjects", total_subjects)
+        st.metric("Total Subjects", overview["subjects"])
+        st.markdown("</div>", unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown("<div class='stats-card'>", unsafe_allow_html=True)
+        if overview["pass_rate"] is not None:
+            st.metric("Passed All Subjects", f"{overview['pass_rate']:.1f}%")
+        else:
+            st.metric("Passed All Subjects", "N/A")
         st.markdown("</div>", unsafe_allow_html=True)
     
     # Create a simple visualization for SGPA distribution
     try:
-        # Convert SGPA to numeric, coercing errors to NaN
-        sgpa_data = pd.to_numeric(df['SGPA'].replace(['-----', 'N/A'], pd.NA), errors='coerce')
-        sgpa_data = sgpa_data.dropna()
+        sgpa_data = analytics.sgpa.dropna()
         
         if not sgpa_data.empty and len(sgpa_data) > 1:
             fig = px.histogram(
@@ -182,11 +226,148 @@ def show_statistics(df):
             st.info("Not enough valid SGPA data to create a distribution chart.")
     except Exception as e:
         st.info(f"Could not generate SGPA distribution chart: {str(e)}")
+    
+    subjects_tab, grades_tab, toppers_tab, backlogs_tab = st.tabs(
+        ["Subject Results", "Grade Distribution", "Toppers", "Backlogs"])
+    
+    with subjects_tab:
+        st.dataframe(analytics.subject_summary, use_container_width=True, hide_index=True)
+    
+    with grades_tab:
+        grades = analytics.grade_distribution
+        if not grades.empty:
+            fig = px.bar(
+                grades.melt(id_vars=["Subject", "Component"], var_name="Grade", value_name="Students"),
+                x="Subject",
+                y="Students",
+                color="Grade",
+                facet_row="Component",
+                title="Grades by Subject",
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(grades, use_container_width=True, hide_index=True)
+    
+    with toppers_tab:
+        st.dataframe(analytics.toppers(), use_container_width=True, hide_index=True)
+    
+    with backlogs_tab:
+        st.write(f"{analytics.overview['students_with_backlogs']} students failed at least one subject.")
+        st.dataframe(analytics.backlog_distribution, use_container_width=True, hide_index=True)
+
+# Timers and counters collected while processing the last file
+def show_run_metrics(summary):
+    """Show a run metrics summary from debug_utils.metrics"""
+    st.markdown("<h3 class='sub-header'>⏱️ Run Metrics</h3>", unsafe_allow_html=True)
+    timers = summary["timers"]
+    if timers:
+        total_seconds = sum(timer["seconds"] for timer in timers.values()) or 1
+        timer_df = pd.DataFrame(
+            [(name, timer["calls"], timer["seconds"], 100 * timer["seconds"] / total_seconds)
+             for name, timer in timers.items()],
+            columns=["Stage", "Calls", "Seconds", "% of timed"],
+        )
+        st.dataframe(timer_df, use_container_width=True, hide_index=True)
+    
+    counters = summary["counters"]
+    if counters:
+        cols = st.columns(min(len(counters), 4))
+        for i, (name, value) in enumerate(counters.items()):
+            cols[i % len(cols)].metric(name.replace("_", " ").title(), f"{value:,}")
+    
+    peaks = summary["peaks"]
+    if peaks:
+        cols = st.columns(min(len(peaks), 4))
+        for i, (name, value) in enumerate(peaks.items()):
+            cols[i % len(cols)].metric(f"Peak {name.replace('_', ' ').upper()}", f"{value:,}")
+    
+    st.download_button("Download metrics (JSON)", json.dumps(summary, indent=2),
+                       file_name="run_metrics.json", mime="application/json")
 
 # Save extracted data to session state
-def save_data_to_session_state(df):
+def save_data_to_session_state(df, file_hash):
     """Save DataFrame to session state for later use"""
     st.session_state['extracted_data'] = df
+    st.session_state['extracted_hash'] = file_hash
+
+# Hand an upload to the background queue; show_job_progress picks up the result
+def submit_upload(uploaded_file, file_hash, collect_metrics=False):
+    """Queue the extraction of an upload for this session"""
+    try:
+        get_job_manager().submit(file_hash, uploaded_file.getvalue(), collect_metrics)
+    except QueueFullError:
+        st.warning("The server is busy processing other files. Please try again in a minute.")
+        return
+    st.session_state['job_id'] = file_hash
+    st.session_state['job_error'] = None
+    st.session_state['job_name'] = uploaded_file.name
+    st.session_state['run_metrics'] = None
+
+def finish_job(error=None):
+    """Stop polling: clear the job and rerun the whole page, which no longer renders the fragment"""
+    st.session_state['job_id'] = None
+    st.session_state['job_error'] = error
+    st.rerun()
+
+# Reruns itself every second without rerunning the page. Only rendered while
+# this session has a job; every finished job ends with a full rerun so idle
+# sessions don't keep polling.
+@st.fragment(run_every=1.0)
+def show_job_progress():
+    """Poll this session's job and store its results once it finishes"""
+    job_id = st.session_state.get('job_id')
+    if job_id is None:
+        return
+    jobs = get_job_manager()
+    status = jobs.status(job_id)
+    if status is None:
+        finish_job("The extraction job was lost. Please process the file again.")
+    
+    if status["state"] == "queued":
+        st.info(f"Waiting for a free worker ({status['jobs_ahead']} jobs ahead)...")
+    elif status["state"] == "running":
+        fraction, text = describe_progress(status["stage"], status["done"], status["total"], status["students"])
+        st.text(text)
+        st.progress(fraction)
+    elif status["state"] == "failed":
+        finish_job(f"Error processing PDF: {status['error']}")
+    else:
+        all_students_data, run_metrics = jobs.result(job_id)
+        if not all_students_data:
+            finish_job("No data could be extracted from the PDF. Please check the file format.")
+        try:
+            # The content hash makes re-processing the same PDF replace its exam
+            get_result_store().add_exam(all_students_data, st.session_state.get('job_name') or job_id[:12],
+                                        source_hash=job_id)
+        except Exception as e:
+            print(f"Could not save results to the result store: {str(e)}")
+        # The Excel file itself is only written when it is downloaded
+        df = build_students_frame(all_students_data)
+        save_data_to_session_state(df, job_id)
+        st.session_state['processing_complete'] = True
+        st.session_state['run_metrics'] = run_metrics
+        # Full rerun so the results section renders
+        finish_job()
+
+# Search across every exam saved in the result store
+def show_result_search():
+    """PRN / seat number / name search over the result store"""
+    st.markdown("<h3 class='sub-header'>🔎 Search Stored Results</h3>", unsafe_allow_html=True)
+    term = st.text_input("PRN, seat number or name", key="result_search")
+    if not term.strip():
+        return
+    store = get_result_store()
+    matches = store.search(term)
+    if matches.empty:
+        st.info("No stored results match your search.")
+        return
+    st.dataframe(matches.drop(columns="student_id"), use_container_width=True, hide_index=True)
+    
+    prns = list(matches["prn"].dropna().unique())
+    if not prns:
+        return
+    prn = st.selectbox("Show every result for PRN", prns) if len(prns) > 1 else prns[0]
+    st.markdown(f"**All results for {prn}**")
+    st.dataframe(store.student_history(prn), use_container_width=True, hide_index=True)
 
 # Main app function
 def main():
@@ -228,6 +409,39 @@ def main():
             """
         )
         
+        # Re-uploads of the same PDF are served from the extraction cache
+        st.markdown("### Extraction Cache")
+        cache_stats = get_default_cache().stats()
+        st.markdown(
+            f"""
+            - Hits: {cache_stats['hits']}
+            - Misses: {cache_stats['misses']}
+            - Cached files: {cache_stats['entries']} ({cache_stats['size_bytes'] / (1024 * 1024):.1f} MB)
+            """
+        )
+        
+        st.markdown("### Processing Queue")
+        job_stats = get_job_manager().stats()
+        st.markdown(
+            f"""
+            - Running: {job_stats['running']} of {job_stats['workers']} workers
+            - Waiting: {job_stats['queued']} (limit {job_stats['max_active']} active jobs)
+            """
+        )
+        
+        st.markdown("### Result Store")
+        store_stats = get_result_store().stats()
+        st.markdown(
+            f"""
+            - Exams: {store_stats['exams']}
+            - Students: {store_stats['students']}
+            """
+        )
+        
+        st.markdown("### Diagnostics")
+        collect_metrics = st.checkbox("Collect run metrics", value=metrics.enabled,
+                                      help="Time each extraction stage and count pages, students and subject lines")
+        
         # Add TIC Club attribution
         st.markdown("---")
         st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
@@ -254,73 +468,43 @@ def main():
             st.write(f"- **{key}:** {value}")
         st.markdown("</div>", unsafe_allow_html=True)
         
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            pdf_path = tmp_file.name
+        file_hash = get_upload_hash(uploaded_file)
+        already_processed = st.session_state.get('extracted_hash') == file_hash
         
         # Process button
-        if st.button("Process PDF", key="process_button"):
-            try:
-                # Show loading animation
-                processing_animation()
-                
-                # Process the PDF file
-                with st.spinner("Extracting data from PDF..."):
-                    progress_bar_with_animation("Extracting student information", 10)
-                    all_students_data = extract_tables_from_pdf(pdf_path)
-                
-                if not all_students_data:
-                    st.error("No data could be extracted from the PDF. Please check the file format.")
-                else:
-                    # Save to Excel
-                    excel_file = "students_data.xlsx"
-                    with st.spinner("Saving data to Excel..."):
-                        progress_bar_with_animation("Creating Excel file", 5)
-                        df = save_to_excel(all_students_data, excel_file)
-                    
-                    # Store in session state
-                    save_data_to_session_state(df)
-                    st.session_state['processing_complete'] = True
-                    
-                    # Success message
-                    st.markdown("<div class='success-box'>", unsafe_allow_html=True)
-                    st.success(f"✅ Successfully extracted data for {len(df)} students!")
-                    st.markdown(get_excel_download_link(df), unsafe_allow_html=True)
-                    st.markdown("</div>", unsafe_allow_html=True)
-                    
-                    # Display statistics
-                    show_statistics(df)
-                    
-                    # Preview the data
-                    st.markdown("<h3 class='sub-header'>👁️ Data Preview</h3>", unsafe_allow_html=True)
-                    st.dataframe(df.head(5), use_container_width=True)
-                    
-            except Exception as e:
-                st.error(f"Error processing PDF: {str(e)}")
-                import traceback
-                st.error(traceback.format_exc())
-            
-            finally:
-                # Remove the temporary file
-                try:
-                    os.unlink(pdf_path)
-                except:
-                    pass
+        if st.button("Process PDF", key="process_button",
+                     disabled=st.session_state.get('job_id') is not None):
+            if already_processed and st.session_state.get('extracted_data') is not None:
+                st.info("This file has already been processed; showing the existing results.")
+            else:
+                submit_upload(uploaded_file, file_hash, collect_metrics)
+    
+    if st.session_state.get('job_id') is not None:
+        show_job_progress()
+    elif st.session_state.get('job_error'):
+        st.error(st.session_state['job_error'])
     
     # Show download button if processing is already complete
     if st.session_state.get('processing_complete', False) and st.session_state.get('extracted_data') is not None:
+        df = st.session_state['extracted_data']
+        file_hash = st.session_state['extracted_hash']
         st.markdown("<div class='success-box'>", unsafe_allow_html=True)
-        st.success("Your data has been processed and is ready for download!")
-        st.markdown(get_excel_download_link(st.session_state['extracted_data']), unsafe_allow_html=True)
+        st.success(f"✅ Extracted data for {len(df)} students is ready for download!")
+        analytics = get_analytics(file_hash, df)
+        show_excel_download(file_hash, df, analytics)
         st.markdown("</div>", unsafe_allow_html=True)
         
         # Display statistics for data in session state
-        show_statistics(st.session_state['extracted_data'])
+        show_statistics(analytics)
         
         # Preview the data
         st.markdown("<h3 class='sub-header'>👁️ Data Preview</h3>", unsafe_allow_html=True)
-        st.dataframe(st.session_state['extracted_data'].head(5), use_container_width=True)
+        st.dataframe(df.head(5), use_container_width=True)
+        
+        if st.session_state.get('run_metrics'):
+            show_run_metrics(st.session_state['run_metrics'])
+    
+    show_result_search()
     
     # Add footer with TIC Club attribution
     st.markdown("---")
@@ -0,0 +1,117 @@
+# bench_column_layout.py
+"""Text heuristic vs layout mode (iter_students(..., layout=True)) on a
+fixed-width synthetic sheet with blank cells: per-field accuracy of the
+parsed subject values against the generated table, parse time per mode
+and end-to-end extraction time on each text backend. A free-flow sheet
+(no columns, no blanks) is checked to give identical students either way.
+
+  python benchmarks/bench_column_layout.py --students 500 --blank-rate 0.05 [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extractor import (RESULT_FIELDS, SUBJECT_LINE_PATTERN, TEXT_BACKENDS, ColumnTemplates, _parse_page_layout,
+                           _parse_page_records, iter_students, metrics, open_text_backend, student_results)
+from synthetic import add_sheet_arguments, best_time, pages_from_args, row_cells, write_pdf
+
+
+def expected_rows(pages):
+    # The nine values of every subject line as the parsers should report them
+    rows = []
+    for lines in pages:
+        for line in lines:
+            if SUBJECT_LINE_PATTERN.match(line):
+                values = [cell if cell is not None else "N/A" for cell in row_cells(line)]
+                values[3] = values[3].lstrip('*')
+                rows.append(values)
+    return rows
+
+
+def parsed_rows(students):
+    return [list(values) for student in students for _, _, _, values in student_results(student)[1]]
+
+
+def field_accuracy(expected, parsed):
+    if len(expected) != len(parsed):
+        return None
+    return [sum(e[i] == p[i] for e, p in zip(expected, parsed)) / len(expected) for i in range(len(RESULT_FIELDS))]
+
+
+def parse_times(pdf_path, backend, repeat):
+    # Parsing only: the page text / lines are extracted once up front
+    with open_text_backend(pdf_path, backend, prefilter=False) as pages:
+        texts = list(pages.iter_texts())
+        lines = list(pages.iter_lines())
+    _, text_time = best_time(lambda: [s for text in texts for s in _parse_page_records(text)], repeat)
+
+    def parse_layout():
+        templates = ColumnTemplates()
+        return [s for page in lines for s in _parse_page_layout(page, templates, as_records=True)]
+    _, layout_time = best_time(parse_layout, repeat)
+    return text_time, layout_time
+
+
+def extract(pdf_path, backend, layout, as_records=True):
+    return list(iter_students(pdf_path, as_records=as_records, backend=backend, layout=layout))
+
+
+def report(pdf_path, pages, repeat):
+    expected = expected_rows(pages)
+    print(f"  {len(expected)} subject lines")
+    for backend in TEXT_BACKENDS:
+        (text_students, text_time) = best_time(lambda: extract(pdf_path, backend, False), repeat)
+        metrics.reset()
+        metrics.enable()
+        (layout_students, layout_time) = best_time(lambda: extract(pdf_path, backend, True), repeat)
+        counts = metrics.summary()["counters"]
+        metrics.enable(False)
+        parse_text, parse_layout = parse_times(pdf_path, backend, repeat)
+
+        print(f"  {backend}: extract {text_time:6.2f} s text, {layout_time:6.2f} s layout; "
+              f"parse {parse_text:5.2f} s text, {parse_layout:5.2f} s layout; "
+              f"fallbacks {counts.get('layout_fallbacks', 0) // repeat}")
+        for mode, students in (("text", text_students), ("layout", layout_students)):
+            accuracy = field_accuracy(expected, parsed_rows(students))
+            if accuracy is None:
+                print(f"    {mode:6s} line count differs")
+                continue
+            fields = "  ".join(f"{field} {share:6.1%}" for field, share in zip(RESULT_FIELDS, accuracy))
+            print(f"    {mode:6s} {fields}")
+
+
+def check_free_flow(args, tmp_dir):
+    args.columns, args.blank_rate = False, 0.0
+    pdf_path = os.path.join(tmp_dir, "free.pdf")
+    write_pdf(pages_from_args(args), pdf_path)
+    for backend in TEXT_BACKENDS:
+        with contextlib.redirect_stdout(io.StringIO()):
+            identical = extract(pdf_path, backend, False, False) == extract(pdf_path, backend, True, False)
+        print(f"  {backend}: layout output {'identical' if identical else 'DIFFERS'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per setting (best is reported)")
+    add_sheet_arguments(parser)
+    parser.set_defaults(students=500, blank_rate=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        args.columns = True
+        pages = pages_from_args(args)
+        pdf_path = os.path.join(tmp_dir, "columns.pdf")
+        write_pdf(pages, pdf_path)
+        print(f"fixed-width sheet: {args.students} students, {len(pages)} pages, {args.blank_rate:.0%} blank cells")
+        report(pdf_path, pages, args.repeat)
+        print("free-flow sheet:")
+        check_free_flow(args, tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
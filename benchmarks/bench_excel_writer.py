@@ -0,0 +1,74 @@
+# bench_excel_writer.py
+"""Throughput and peak memory of the Excel export paths:
+  pandas   - build the DataFrame and write it with DataFrame.to_excel
+  frame    - build the DataFrame and write it with write_frame_to_excel
+  stream   - stream_students_to_excel straight from the records
+Each path runs in its own child process so peak RSS is measured separately.
+
+  python benchmarks/bench_excel_writer.py [--students N] [--subjects S]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("pandas", "frame", "stream")
+
+
+def run_mode(mode, students, subjects, seed, output):
+    from pdf_extractor import build_students_frame, stream_students_to_excel, write_frame_to_excel
+    from bench_frame_builder import make_students
+
+    def generate():
+        # Records are produced one at a time, like iter_students does
+        for batch_start in range(0, students, 1000):
+            yield from make_students(min(1000, students - batch_start), subjects, seed, batch_start)
+
+    start = time.perf_counter()
+    if mode == "stream":
+        rows = stream_students_to_excel(generate(), output)
+    else:
+        df = build_students_frame(list(generate()))
+        if mode == "pandas":
+            df.to_excel(output, index=False)
+        else:
+            write_frame_to_excel(df, output)
+        rows = len(df)
+    elapsed = time.perf_counter() - start
+    peak_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:7s} {rows:8d} rows  {elapsed:8.2f} s  {rows / elapsed:10,.0f} rows/s  peak RSS {peak_mib:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--subjects", type=int, default=33)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        # Child process: the last line it prints is the report for this mode
+        run_mode(args.mode, args.students, args.subjects, args.seed, args.output)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in args.modes:
+            output = os.path.join(tmp_dir, f"{mode}.xlsx")
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--output", output,
+                 "--students", str(args.students), "--subjects", str(args.subjects), "--seed", str(args.seed)],
+                capture_output=True, text=True, check=True)
+            print(result.stdout.strip().splitlines()[-1])
+            print(f"{'':7s} file size {os.path.getsize(output) / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# bench_frame_builder.py
+"""Times building the output DataFrame for a wide multi-branch sheet:
+build_students_frame against the column reconciliation save_to_excel used
+to do (fill every missing key, build the frame twice, order columns by
+repeated scans, dedup with list.count).
+
+  python benchmarks/bench_frame_builder.py [--students N] [--subjects S]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from pdf_extractor import BASE_COLUMNS, SUBJECT_FIELDS, build_students_frame
+
+
+def legacy_build_frame(data_list):
+    # Frame-building part of the original save_to_excel, minus the Excel write
+    all_keys = set()
+    for student_data in data_list:
+        all_keys.update(student_data.keys())
+    for student_data in data_list:
+        for key in all_keys:
+            if key not in student_data:
+                student_data[key] = None
+    df = pd.DataFrame(data_list)
+    df = pd.DataFrame(data_list)
+    base_columns = list(BASE_COLUMNS)
+    other_columns = [col for col in df.columns if col not in base_columns]
+    other_columns.sort()
+    subject_codes = set()
+    for col in other_columns:
+        parts = col.split('_')
+        if len(parts) >= 2:
+            subject_codes.add(parts[0])
+    ordered_other_columns = []
+    for subject in sorted(subject_codes):
+        subject_cols = [col for col in other_columns if col.startswith(subject)]
+        col_order = ["_CCE", "_ESE", "_TW", "_TOT", "_CRD", "_ERN_CRD", "_GRD", "_GRD_PNT", "_CRD_PNT"]
+        ordered_subject_cols = []
+        for suffix in col_order:
+            for col in subject_cols:
+                if col.endswith(suffix) or any(col.endswith(f"{suffix}_{i}") for i in range(1, 10)):
+                    ordered_subject_cols.append(col)
+        remaining_cols = [col for col in subject_cols if col not in ordered_subject_cols]
+        ordered_subject_cols.extend(remaining_cols)
+        ordered_other_columns.extend(ordered_subject_cols)
+    final_columns = base_columns + ordered_other_columns
+    existing_columns = [col for col in final_columns if col in df.columns]
+    df = df[existing_columns]
+    if len(df.columns) != len(set(df.columns)):
+        duplicates = [col for col in df.columns if list(df.columns).count(col) > 1]
+        for dup in duplicates:
+            dups = [i for i, col in enumerate(df.columns) if col == dup]
+            for i, idx in enumerate(dups[1:], 1):
+                df.columns.values[idx] = f"{dup}_{i}"
+    df.drop_duplicates(subset=["PRN"], keep="first", inplace=True)
+    return df
+
+
+def make_students(count, subject_count, seed, first_index=0):
+    # Students from several branches, each branch taking its own slice of the
+    # subject codes, so most subject columns are empty for any one student.
+    # The subject codes depend only on seed, so batches generated with
+    # increasing first_index share the same columns.
+    rng = random.Random(seed)
+    codes = [f"{rng.choice(['AEC', 'BSC', 'ESC', 'PCC', 'OEC'])}-{100 + i}" for i in range(subject_count)]
+    rng.shuffle(codes)
+    branches = [codes[i:i + 10] for i in range(0, len(codes), 5)]
+    rng = random.Random(seed + first_index)
+    students = []
+    for i in range(first_index, first_index + count):
+        student = {
+            "PRN": f"2021{i:07d}", "Seat No": f"S{i:06d}", "Name": f"STUDENT {i}",
+            "Mother Name": "MOTHER", "Semester": "1", "SGPA": "7.50",
+            "Credits Earned/Total": "20/22", "Total Credit Points": "150",
+        }
+        for code in rng.choice(branches):
+            for suffix in SUBJECT_FIELDS:
+                student[code + suffix] = str(rng.randint(0, 99))
+        students.append(student)
+    return students
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=50000)
+    parser.add_argument("--subjects", type=int, default=33, help="subject codes (x9 columns)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    students = make_students(args.students, args.subjects, args.seed)
+    columns = len(set().union(*students))
+    print(f"students: {len(students)}, columns: {columns}")
+
+    start = time.perf_counter()
+    df = build_students_frame(students)
+    current = time.perf_counter() - start
+    print(f"build_students_frame: {current:8.2f} s  {df.shape}")
+
+    if not args.skip_legacy:
+        # The legacy path mutates its input, so give it its own copy
+        legacy_input = [dict(student) for student in students]
+        start = time.perf_counter()
+        legacy_df = legacy_build_frame(legacy_input)
+        legacy = time.perf_counter() - start
+        print(f"legacy reconciliation: {legacy:7.2f} s  {legacy_df.shape}  ({legacy / current:.1f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# bench_incremental.py
+"""Incremental re-extraction (pdf_extractor.extract_incremental) of a
+republished sheet: a synthetic sheet is extracted once, a few students on
+different pages are corrected, and the new version is extracted again
+with the saved page state. Reports the pages reused and the time against
+a full extraction, and checks the students are identical to a full
+extraction of the new version. Run with both plain pages and pages drawn
+through form XObjects (every content stream is then just "/X1 Do").
+Exits with status 1 if any check fails.
+
+  python benchmarks/bench_incremental.py --students 400 --changes 3
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extractor import extract_incremental, iter_students
+from synthetic import add_sheet_arguments, pages_from_args, write_pdf
+
+
+def corrected(pages, changes):
+    # Renames one student on each of `changes` pages spread over the sheet
+    pages = [list(lines) for lines in pages]
+    student_pages = [i for i, lines in enumerate(pages) if any(line.startswith("PRN:") for line in lines)]
+    for i in student_pages[::max(1, len(student_pages) // changes)][:changes]:
+        line = next(j for j, line in enumerate(pages[i]) if line.startswith("PRN:"))
+        pages[i][line] = pages[i][line].replace("NAME:STUDENT", "NAME:CORRECTED")
+    return pages
+
+
+def report(pages, changes, xobjects, tmp_dir):
+    old_path = os.path.join(tmp_dir, "old.pdf")
+    new_path = os.path.join(tmp_dir, "new.pdf")
+    state_path = os.path.join(tmp_dir, "sheet.pages.json.gz")
+    write_pdf(pages, old_path, xobjects=xobjects)
+    write_pdf(corrected(pages, changes), new_path, xobjects=xobjects)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract_incremental(old_path, state_path)
+        start = time.perf_counter()
+        full = list(iter_students(new_path))
+        full_time = time.perf_counter() - start
+        start = time.perf_counter()
+        students, changes_found = extract_incremental(new_path, state_path)
+        incremental_time = time.perf_counter() - start
+
+    identical = students == full
+    print(f"  {'xobject' if xobjects else 'plain':8s} {len(pages):5d} pages  full {full_time:6.2f} s, "
+          f"incremental {incremental_time:6.2f} s  reused {changes_found['pages_reused']}, "
+          f"parsed {changes_found['pages_parsed']}, {len(changes_found['changed'])} PRNs changed, "
+          f"output {'identical' if identical else 'DIFFERS'}")
+    return identical and len(changes_found["changed"]) == changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--changes", type=int, default=3, help="students corrected in the new version")
+    add_sheet_arguments(parser)
+    parser.set_defaults(students=400)
+    args = parser.parse_args()
+
+    pages = pages_from_args(args)
+    print(f"synthetic sheet: {args.students} students, {args.changes} corrected")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = [report(pages, args.changes, xobjects, tmp_dir) for xobjects in (False, True)]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+# bench_page_filter.py
+"""Effect of the page pre-filter (pdf_extractor.page_may_have_students) on each
+text backend: extraction time with and without it, pages skipped, and an
+accuracy check. Skipped pages must hold no students when extracted in
+full, and the students of the whole PDF must be identical either way.
+Pages the filter kept that turned out to have no students are reported as
+"kept empty" (skips it could not prove safe).
+
+  python benchmarks/bench_page_filter.py results.pdf [more.pdf ...] [--repeat N]
+  python benchmarks/bench_page_filter.py --students 2000 --extra-pages 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extractor import TEXT_BACKENDS, _parse_page_text, open_text_backend
+from synthetic import add_sheet_arguments, best_time, pages_from_args, write_pdf
+
+
+def page_texts(pdf_path, backend, prefilter, repeat):
+    def extract():
+        with open_text_backend(pdf_path, backend, prefilter=prefilter) as pages:
+            return list(pages.iter_texts())
+    return best_time(extract, repeat)
+
+
+def report(pdf_path, repeat):
+    print(pdf_path)
+    for backend in TEXT_BACKENDS:
+        full_texts, full_time = page_texts(pdf_path, backend, False, repeat)
+        filtered_texts, filtered_time = page_texts(pdf_path, backend, True, repeat)
+
+        full_students = [_parse_page_text(text) for text in full_texts]
+        skipped = [i for i, (full, filtered) in enumerate(zip(full_texts, filtered_texts))
+                   if full and not filtered]
+        lost = sum(len(full_students[i]) for i in skipped)
+        kept_empty = sum(1 for i, students in enumerate(full_students) if not students and i not in skipped)
+        identical = [student for text in filtered_texts for student in _parse_page_text(text)] == \
+                    [student for students in full_students for student in students]
+        print(f"  {backend:11s} {len(full_texts):6d} pages  {full_time:7.2f} s -> {filtered_time:7.2f} s  "
+              f"({full_time / filtered_time:4.2f}x)  skipped {len(skipped)}, kept empty {kept_empty}, "
+              f"students lost {lost}, output {'identical' if identical else 'DIFFERS'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDFs to check (default: a synthetic sheet)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per setting (best is reported)")
+    add_sheet_arguments(parser)
+    args = parser.parse_args()
+
+    if args.pdfs:
+        for pdf_path in args.pdfs:
+            report(pdf_path, args.repeat)
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "sheet.pdf")
+        pages = pages_from_args(args)
+        write_pdf(pages, pdf_path)
+        print(f"synthetic sheet: {args.students} students, {len(pages)} pages")
+        report(pdf_path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
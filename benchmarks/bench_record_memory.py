@@ -0,0 +1,63 @@
+# bench_record_memory.py
+"""Compares the memory held by a large result sheet in the wide dict layout
+against the slotted StudentRecord/SubjectResult model, and checks that
+StudentRecord.to_dict() reproduces the dicts exactly.
+
+  python benchmarks/bench_record_memory.py [--students N]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extractor import _parse_page_records, _parse_page_text
+from bench_subject_parser import make_student_block
+
+
+def measure(parse_page, pages):
+    # Memory still allocated once every page has been parsed and kept
+    gc.collect()
+    tracemalloc.start()
+    students = []
+    for page_text in pages:
+        students.extend(parse_page(page_text))
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return students, current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--per-page", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    blocks = [make_student_block(rng, i) for i in range(args.students)]
+    pages = ["\n".join(blocks[i:i + args.per_page]) for i in range(0, len(blocks), args.per_page)]
+
+    dicts, dict_bytes, dict_peak = measure(_parse_page_text, pages)
+    del dicts
+    records, record_bytes, record_peak = measure(_parse_page_records, pages)
+
+    subjects = sum(len(record.subjects) for record in records)
+    mismatches = sum(1 for record, page_students in zip(
+        records, (s for p in pages for s in _parse_page_text(p)))
+        if list(record.to_dict().items()) != list(page_students.items()))
+
+    print(f"students: {len(records)}, subject rows: {subjects}")
+    print(f"wide dicts:      {dict_bytes / 2**20:8.1f} MiB retained ({dict_bytes / len(records):6.0f} B/student), peak {dict_peak / 2**20:.1f} MiB")
+    print(f"StudentRecord:   {record_bytes / 2**20:8.1f} MiB retained ({record_bytes / len(records):6.0f} B/student), peak {record_peak / 2**20:.1f} MiB")
+    print(f"reduction:       {dict_bytes / record_bytes:.1f}x")
+    print(f"to_dict mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
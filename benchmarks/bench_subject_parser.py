@@ -0,0 +1,196 @@
+# bench_subject_parser.py
+"""Micro-benchmark for parse_subjects_from_text: compares the current
+single-pass parser against the original per-line regex/token scanner and
+checks that both produce identical output.
+
+  python benchmarks/bench_subject_parser.py [--students N] [--repeat R]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extractor import parse_subjects_from_text
+
+GRADE_TOKENS = ["O", "A+", "A", "B+", "B", "C+", "C", "D", "E", "F", "FFF"]
+SUBJECT_CODES = ["AEC-101", "BSC-102", "ESC-103", "PCC-104", "PCC-105", "VSE-106",
+                 "IKS-107", "CCA-108-ABC", "OEC-109-1", "MDM-110"]
+
+
+def legacy_parse_subjects_from_text(student_text):
+    # The parser as it was before precompiling: kept verbatim as the reference
+    subjects_data = {}
+    lines = student_text.strip().split("\n")
+    subject_lines = []
+    for line in lines:
+        line = line.strip()
+        if re.match(r"^[A-Z]{3}-\d+(?:-[A-Z]{3})?(?:-\d+)?(?:_TW)?", line):
+            subject_lines.append(line)
+    added_keys = set()
+    for line in subject_lines:
+        parts = re.split(r'\s+', line)
+        if len(parts) < 3:
+            continue
+        subject_code = parts[0]
+        is_tw_line = "_TW" in subject_code
+        if is_tw_line:
+            base_subject_code = subject_code.replace("_TW", "")
+            column_prefix = f"{base_subject_code}_TW"
+        else:
+            column_prefix = subject_code
+        cce = ese = tw = tot = crd = ern_crd = grd = grd_pnt = crd_pnt = "N/A"
+        grade_patterns = ["A+", "A", "B+", "B", "C+", "C", "D", "E", "F", "O", "FFF"]
+        grade_index = -1
+        for i, part in enumerate(parts):
+            if part in grade_patterns:
+                grade_index = i
+                grd = part
+                break
+        if grade_index > 0:
+            if grade_index + 1 < len(parts) and parts[grade_index + 1].isdigit():
+                grd_pnt = parts[grade_index + 1]
+            if grade_index + 2 < len(parts) and parts[grade_index + 2].isdigit():
+                crd_pnt = parts[grade_index + 2]
+            if grade_index - 1 >= 0:
+                ern_crd = parts[grade_index - 1]
+            if grade_index - 2 >= 0:
+                crd = parts[grade_index - 2]
+            if grade_index - 3 >= 0:
+                tot = parts[grade_index - 3]
+                if tot.startswith('*'):
+                    tot = tot[1:]
+            value_indices = []
+            for i in range(1, min(grade_index, len(parts))):
+                value = parts[i].replace('*', '')
+                if value.isdigit() or value == "---":
+                    value_indices.append(i)
+            if len(value_indices) >= 1:
+                idx = value_indices[0]
+                cce = parts[idx].replace('*', '')
+                if parts[idx].startswith('*'):
+                    cce = f"*{cce}"
+            if len(value_indices) >= 2:
+                idx = value_indices[1]
+                ese = parts[idx].replace('*', '')
+                if parts[idx].startswith('*'):
+                    ese = f"*{ese}"
+            if len(value_indices) >= 3:
+                idx = value_indices[2]
+                tw = parts[idx].replace('*', '')
+                if parts[idx].startswith('*'):
+                    tw = f"*{tw}"
+        else:
+            numeric_indices = []
+            for i, part in enumerate(parts):
+                clean_part = part.replace('*', '')
+                if clean_part.isdigit() or clean_part == "---":
+                    numeric_indices.append(i)
+            if len(numeric_indices) >= 3:
+                cce_idx, ese_idx, tw_idx = numeric_indices[:3]
+                cce = parts[cce_idx].replace('*', '')
+                ese = parts[ese_idx].replace('*', '')
+                tw = parts[tw_idx].replace('*', '')
+                if parts[cce_idx].startswith('*'):
+                    cce = f"*{cce}"
+                if parts[ese_idx].startswith('*'):
+                    ese = f"*{ese}"
+                if parts[tw_idx].startswith('*'):
+                    tw = f"*{tw}"
+        keys_to_store = {
+            f"{column_prefix}_CCE": cce,
+            f"{column_prefix}_ESE": ese,
+            f"{column_prefix}_TW": tw,
+            f"{column_prefix}_TOT": tot,
+            f"{column_prefix}_CRD": crd,
+            f"{column_prefix}_ERN_CRD": ern_crd,
+            f"{column_prefix}_GRD": grd,
+            f"{column_prefix}_GRD_PNT": grd_pnt,
+            f"{column_prefix}_CRD_PNT": crd_pnt
+        }
+        for key, value in keys_to_store.items():
+            if key not in added_keys:
+                subjects_data[key] = value
+                added_keys.add(key)
+            else:
+                i = 1
+                new_key = f"{key}_{i}"
+                while new_key in added_keys:
+                    i += 1
+                    new_key = f"{key}_{i}"
+                subjects_data[new_key] = value
+                added_keys.add(new_key)
+    return subjects_data
+
+
+def mark(rng, low, high):
+    # Marks are plain, grace-marked with '*', or absent as "---"
+    roll = rng.random()
+    if roll < 0.15:
+        return "---"
+    value = str(rng.randint(low, high))
+    return f"*{value}" if roll < 0.3 else value
+
+
+def make_student_block(rng, index):
+    lines = [
+        f"PRN:2021{index:06d} SEAT NO.:S{index:05d} NAME:STUDENT {index} Mother Name- MOTHER {index}",
+        f"Semester: {rng.randint(1, 8)}",
+        "Course Code CCE ESE TW TOT CRD ERN_CRD GRD GRD_PNT CRD_PNT",
+    ]
+    for code in rng.sample(SUBJECT_CODES, rng.randint(4, 9)):
+        credits = str(rng.randint(1, 4))
+        tokens = [code, mark(rng, 5, 30), mark(rng, 10, 60), "---", mark(rng, 10, 99), credits, credits]
+        if rng.random() > 0.05:  # a few lines lose their grade column
+            tokens.append(rng.choice(GRADE_TOKENS))
+        tokens += [str(rng.randint(0, 10)), str(rng.randint(0, 40))]
+        lines.append(" ".join(tokens))
+        if rng.random() < 0.3:
+            lines.append(f"{code}_TW --- --- {rng.randint(10, 25)} {rng.randint(10, 25)} 1 1 {rng.choice(GRADE_TOKENS)} 9 9")
+    if rng.random() < 0.1:  # repeated subject -> numbered columns
+        lines.append(lines[3])
+    lines.append(f"First Semester SGPA : {rng.uniform(4, 10):.2f} Credits Earned/Total : 20/22 Total Credit Points : {rng.randint(50, 200)}")
+    return "\n".join(lines)
+
+
+def time_parser(parser, blocks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for block in blocks:
+            parser(block)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    blocks = [make_student_block(rng, i) for i in range(args.students)]
+    subject_lines = sum(len(legacy_parse_subjects_from_text(b)) for b in blocks) // 9
+
+    mismatches = sum(1 for b in blocks if parse_subjects_from_text(b) != legacy_parse_subjects_from_text(b))
+    # dict equality ignores key order, so compare the rendered items as well
+    mismatches += sum(1 for b in blocks
+                      if list(parse_subjects_from_text(b).items()) != list(legacy_parse_subjects_from_text(b).items()))
+
+    legacy = time_parser(legacy_parse_subjects_from_text, blocks, args.repeat)
+    current = time_parser(parse_subjects_from_text, blocks, args.repeat)
+
+    print(f"students: {args.students}, subject lines: {subject_lines}")
+    print(f"legacy parser:  {subject_lines / legacy:12,.0f} lines/s")
+    print(f"current parser: {subject_lines / current:12,.0f} lines/s  ({legacy / current:.2f}x)")
+    print(f"output mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
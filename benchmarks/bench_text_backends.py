@@ -0,0 +1,47 @@
+# bench_text_backends.py
+"""Page throughput of the text backends in pdf_extractor.TEXT_BACKENDS, plus an
+equivalence check: every page's text and the parsed students must match the
+pdfplumber reference exactly.
+
+  python benchmarks/bench_text_backends.py results.pdf [more.pdf ...] [--repeat N]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extractor import DEFAULT_BACKEND, TEXT_BACKENDS, _parse_page_text, open_text_backend
+from synthetic import best_time
+
+
+def page_texts(pdf_path, backend):
+    with open_text_backend(pdf_path, backend, prefilter=False) as pages:
+        return list(pages.iter_texts())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per backend (best is reported)")
+    args = parser.parse_args()
+
+    for pdf_path in args.pdfs:
+        print(pdf_path)
+        reference = None
+        for backend in TEXT_BACKENDS:
+            texts, best = best_time(lambda: page_texts(pdf_path, backend), args.repeat)
+
+            students = [student for text in texts for student in _parse_page_text(text)]
+            if backend == DEFAULT_BACKEND:
+                reference = (texts, students)
+                check = "reference"
+            else:
+                text_mismatches = sum(a != b for a, b in zip(reference[0], texts)) + abs(len(reference[0]) - len(texts))
+                check = f"{text_mismatches} page text mismatches, students {'identical' if students == reference[1] else 'DIFFER'}"
+            print(f"  {backend:11s} {len(texts):6d} pages  {best:7.2f} s  {len(texts) / best:8.1f} pages/s  "
+                  f"{len(students):6d} students  {check}")
+
+
+if __name__ == "__main__":
+    main()
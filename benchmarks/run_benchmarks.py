@@ -0,0 +1,145 @@
+# run_benchmarks.py
+"""End-to-end benchmark suite on a synthetic result sheet (see synthetic.py):
+every pipeline stage is timed on its own and reported as throughput
+(pages/s for text extraction, students/s for parsing, rows/s for export),
+then run again under tracemalloc for its peak Python memory.
+
+  python benchmarks/run_benchmarks.py [--students N] [--stages parse frame ...]
+  python benchmarks/run_benchmarks.py --json after.json --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extractor import (TEXT_BACKENDS, _parse_page_records, _parse_page_text, build_students_frame,
+                           open_text_backend, save_to_parquet, stream_students_to_excel,
+                           write_frame_to_excel)
+from synthetic import add_sheet_arguments, best_time, page_texts, pages_from_args, write_pdf
+
+
+def stage_text(backend):
+    def run(ctx):
+        # Every page is extracted, so the throughput is per page of real text
+        with open_text_backend(ctx["pdf"], backend, prefilter=False) as pages:
+            ctx["texts"] = list(pages.iter_texts())
+        return len(ctx["texts"])
+    return run
+
+
+def stage_parse(ctx):
+    ctx["students"] = [student for text in ctx["texts"] for student in _parse_page_text(text)]
+    return len(ctx["students"])
+
+
+def stage_parse_records(ctx):
+    return sum(len(_parse_page_records(text)) for text in ctx["texts"])
+
+
+def stage_frame(ctx):
+    ctx["frame"] = build_students_frame(ctx["students"])
+    return len(ctx["frame"])
+
+
+def stage_excel(ctx):
+    write_frame_to_excel(ctx["frame"], io.BytesIO())
+    return len(ctx["frame"])
+
+
+def stage_excel_stream(ctx):
+    return stream_students_to_excel(iter(ctx["students"]), os.path.join(ctx["tmp_dir"], "stream.xlsx"))
+
+
+def stage_parquet(ctx):
+    return save_to_parquet(ctx["students"], os.path.join(ctx["tmp_dir"], "students.parquet")).num_rows
+
+
+# (name, unit, function); later stages read what earlier ones leave in ctx,
+# so the order matters and "parse" and "frame" always run
+STAGES = [(f"text:{backend}", "pages", stage_text(backend)) for backend in TEXT_BACKENDS] + [
+    ("parse", "students", stage_parse),
+    ("parse_records", "students", stage_parse_records),
+    ("frame", "rows", stage_frame),
+    ("excel", "rows", stage_excel),
+    ("excel_stream", "rows", stage_excel_stream),
+    ("parquet", "rows", stage_parquet),
+]
+REQUIRED_STAGES = {"parse", "frame"}
+
+
+def run_stage(function, ctx, repeat, measure_memory):
+    # Extractor progress messages are not part of the measurement
+    count, best = best_time(lambda: function(ctx), repeat)
+    with contextlib.redirect_stdout(io.StringIO()):
+        peak = None
+        if measure_memory:
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            function(ctx)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            tracemalloc.stop()
+    return count, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_sheet_arguments(parser)
+    parser.add_argument("--stages", nargs="+", choices=[name for name, _, _ in STAGES],
+                        help="stages to report (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per stage (best is reported)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    selected = set(args.stages or [name for name, _, _ in STAGES]) | REQUIRED_STAGES
+    if not any(name.startswith("text:") for name in selected):
+        selected.add("text:pdfplumber")
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {result["stage"]: result for result in json.load(f)["results"]}
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pages = pages_from_args(args)
+        ctx = {"pdf": os.path.join(tmp_dir, "sheet.pdf"), "tmp_dir": tmp_dir}
+        write_pdf(pages, ctx["pdf"])
+        print(f"synthetic sheet: {args.students} students, {len(pages)} pages, "
+              f"{os.path.getsize(ctx['pdf']) / 2**20:.1f} MiB PDF")
+        expected_texts = page_texts(pages)
+
+        for name, unit, function in STAGES:
+            if name not in selected:
+                continue
+            count, elapsed, peak = run_stage(function, ctx, args.repeat, not args.no_memory)
+            if name.startswith("text:") and ctx["texts"] != expected_texts:
+                print(f"warning: {name} text differs from the generated sheet")
+            result = {"stage": name, "unit": unit, "count": count, "seconds": elapsed,
+                      "per_second": count / elapsed if elapsed else None, "peak_bytes": peak}
+            results.append(result)
+
+            line = f"{name:16s} {count:8d} {unit:8s} {elapsed:8.3f} s  {result['per_second']:12,.1f} {unit}/s"
+            if peak is not None:
+                line += f"  peak {peak / 2**20:8.1f} MiB"
+            before = baseline.get(name)
+            if before and before.get("per_second"):
+                line += f"  ({result['per_second'] / before['per_second']:.2f}x vs baseline)"
+            print(line)
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"process peak RSS {max_rss:.1f} MiB")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results, "max_rss_mib": max_rss}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# synthetic.py
+"""Synthetic result sheets for benchmarks: student blocks in the same
+"PRN:... SEAT NO.:... NAME:..." / subject-line format the parser reads,
+as page texts or as a small PDF. Uses only the standard library, so it
+runs offline; the PDF is plain Courier text, one sheet line per PDF line.
+
+By default subject lines are single-space separated; --columns prints
+them as a fixed-width table under a matching header row instead.
+
+  python benchmarks/synthetic.py sheet.pdf --students 2000 [--text sheet.txt]
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+GRADE_TOKENS = ["O", "A+", "A", "B+", "B", "C+", "C", "D", "E", "F"]
+CODE_PREFIXES = ["AEC", "BSC", "ESC", "PCC", "VSE", "IKS", "CCA", "OEC", "MDM"]
+COLUMN_HEADER = "Course Code CCE ESE TW TOT CRD ERN_CRD GRD GRD_PNT CRD_PNT"
+COLUMN_LABELS = COLUMN_HEADER.split()[2:]
+# Fixed-width layout: the code column, then right-aligned value columns
+CODE_WIDTH = 16
+FIELD_WIDTHS = [len(label) + 3 for label in COLUMN_LABELS]
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 842
+FONT_SIZE = 7
+LINE_HEIGHT = 9
+
+
+def subject_codes(count, seed):
+    # Mix of the code shapes the subject line pattern accepts: PCC-101,
+    # CCA-108-ABC, OEC-109-1
+    rng = random.Random(seed)
+    codes = []
+    for i in range(count):
+        code = f"{CODE_PREFIXES[i % len(CODE_PREFIXES)]}-{101 + i}"
+        roll = rng.random()
+        if roll < 0.1:
+            code += f"-{rng.choice(['ABC', 'DEF', 'XYZ'])}"
+        elif roll < 0.2:
+            code += f"-{rng.randint(1, 3)}"
+        codes.append(code)
+    return codes
+
+
+def mark(rng, low, high, grace_rate, absent_rate):
+    roll = rng.random()
+    if roll < absent_rate:
+        return "---"
+    value = str(rng.randint(low, high))
+    return f"*{value}" if roll < absent_rate + grace_rate else value
+
+
+def subject_row(code, fields, columns=False):
+    """One subject line; None fields are blank cells"""
+    if columns:
+        return code.ljust(CODE_WIDTH) + "".join((field or "").rjust(width)
+                                                for field, width in zip(fields, FIELD_WIDTHS))
+    return " ".join([code] + [field for field in fields if field is not None])
+
+
+def row_cells(line):
+    """The nine cells (None when blank) of a fixed-width subject line"""
+    cells = []
+    position = CODE_WIDTH
+    for width in FIELD_WIDTHS:
+        cells.append(line[position:position + width].strip() or None)
+        position += width
+    return cells
+
+
+def student_lines(rng, index, codes, subjects=8, tw_rate=0.3, grace_rate=0.1, fail_rate=0.05,
+                  absent_rate=0.1, columns=False, blank_rate=0.0):
+    """Lines of one student block: header, subject lines (plus _TW lines) and the SGPA footer.
+
+    blank_rate leaves that share of subject cells empty (grades included).
+    """
+    lines = [
+        f"PRN:2021{index:07d} SEAT NO.:S{index:06d} NAME:STUDENT {index} MotherName- MOTHER {index}",
+        f"Semester: {rng.randint(1, 8)}",
+        subject_row("Course Code", COLUMN_LABELS, columns),
+    ]
+
+    def row(code, fields):
+        if blank_rate:
+            fields = [None if rng.random() < blank_rate else field for field in fields]
+        return subject_row(code, fields, columns)
+
+    failed = False
+    for code in rng.sample(codes, min(subjects, len(codes))):
+        credits = rng.randint(1, 4)
+        if rng.random() < fail_rate:
+            failed = True
+            grade, grade_point, earned = "FFF", 0, 0
+        else:
+            grade_point = rng.randint(4, 10)
+            grade, earned = GRADE_TOKENS[10 - grade_point], credits
+        lines.append(row(code, [mark(rng, 5, 30, grace_rate, absent_rate),
+                                mark(rng, 10, 60, grace_rate, absent_rate), "---",
+                                mark(rng, 10, 99, grace_rate, absent_rate), str(credits), str(earned),
+                                grade, str(grade_point), str(grade_point * earned)]))
+        if rng.random() < tw_rate:
+            tw_points = rng.randint(6, 10)
+            lines.append(row(f"{code}_TW", ["---", "---", str(rng.randint(10, 25)), str(rng.randint(10, 25)),
+                                            "1", "1", GRADE_TOKENS[10 - tw_points], str(tw_points),
+                                            str(tw_points)]))
+    sgpa = "-----" if failed else f"{rng.uniform(4, 10):.2f}"
+    lines.append(f"First Semester SGPA : {sgpa} Credits Earned/Total : 20/22 "
+                 f"Total Credit Points : {rng.randint(50, 200)}")
+    return lines
+
+
+def make_pages(students, students_per_page=4, seed=7, subject_pool=30, first_index=0, extra_pages=0,
+               **student_options):
+    """Pages (lists of lines) of a result sheet with a title page and a trailing signature page.
+
+    extra_pages adds that many summary pages (no student entries) before the signature page.
+    """
+    codes = subject_codes(subject_pool, seed)
+    rng = random.Random(seed + first_index)
+    pages = [["SAVITRIBAI PHULE PUNE UNIVERSITY", "RESULT SHEET", "Grade legend: O A+ A B+ B C+ C D E F FFF"]]
+    page = []
+    for index in range(first_index, first_index + students):
+        page.extend(student_lines(rng, index, codes, **student_options))
+        if (index - first_index + 1) % students_per_page == 0:
+            pages.append(page)
+            page = []
+    if page:
+        pages.append(page)
+    for number in range(extra_pages):
+        pages.append([f"Result summary {number + 1}", COLUMN_HEADER]
+                     + [f"{code} appeared {rng.randint(50, 500)} passed {rng.randint(10, 50)}" for code in codes])
+    pages.append(["Controller of Examinations", "Signature"])
+    return pages
+
+
+def page_texts(pages):
+    # What the extractor's text backends return for each page
+    return ["\n".join(lines) for lines in pages]
+
+
+def _pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(pages, path, xobjects=False):
+    """Write pages as a minimal uncompressed PDF with one Courier text line per sheet line.
+
+    With xobjects=True each page's text is drawn through a form XObject, so
+    every page has the same content stream ("/X1 Do").
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for lines in pages:
+        content = [f"BT /F1 {FONT_SIZE} Tf {LINE_HEIGHT} TL 20 {PAGE_HEIGHT - 30} Td"]
+        content.extend(f"({_pdf_string(line)}) Tj T*" for line in lines)
+        content.append("ET")
+        data = "\n".join(content).encode("latin-1")
+        resources = "/Font << /F1 3 0 R >>"
+        if xobjects:
+            objects.append(b"<< /Type /XObject /Subtype /Form /BBox [0 0 %d %d] /Resources << %s >> "
+                           b"/Length %d >>\nstream\n%s\nendstream"
+                           % (PAGE_WIDTH, PAGE_HEIGHT, resources.encode(), len(data), data))
+            resources = f"/XObject << /X1 {len(objects)} 0 R >>"
+            data = b"/X1 Do"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(data), data))
+        objects.append((f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                        f"/Resources << {resources} >> /Contents {len(objects)} 0 R >>").encode())
+        kids.append(len(objects))
+    objects[1] = (f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] "
+                  f"/Count {len(kids)} >>").encode()
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        f.writelines(b"%010d 00000 n \n" % offset for offset in offsets)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def best_time(function, repeat=1):
+    """Call function repeat times with stdout silenced (the extractor prints
+    per-page progress); returns (the last result, the fastest run in seconds)"""
+    best = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def add_sheet_arguments(parser):
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--subjects", type=int, default=8, help="subject lines per student")
+    parser.add_argument("--subject-pool", type=int, default=30, help="distinct subject codes in the sheet")
+    parser.add_argument("--per-page", type=int, default=4, help="students per page")
+    parser.add_argument("--tw-rate", type=float, default=0.3, help="share of subjects with a _TW line")
+    parser.add_argument("--grace-rate", type=float, default=0.1, help="share of marks with a '*' grace mark")
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="share of subjects graded FFF")
+    parser.add_argument("--extra-pages", type=int, default=0, help="summary pages without students")
+    parser.add_argument("--columns", action="store_true", help="print subject lines as a fixed-width table")
+    parser.add_argument("--blank-rate", type=float, default=0.0, help="share of subject cells left blank")
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def pages_from_args(args):
+    return make_pages(args.students, students_per_page=args.per_page, seed=args.seed,
+                      subject_pool=args.subject_pool, subjects=args.subjects, tw_rate=args.tw_rate,
+                      grace_rate=args.grace_rate, fail_rate=args.fail_rate, extra_pages=args.extra_pages,
+                      columns=args.columns, blank_rate=args.blank_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic result sheet PDF")
+    parser.add_argument("output", help="PDF file to write")
+    parser.add_argument("--text", help="also write the page texts to this file")
+    parser.add_argument("--xobjects", action="store_true", help="draw each page's text through a form XObject")
+    add_sheet_arguments(parser)
+    args = parser.parse_args()
+
+    pages = pages_from_args(args)
+    write_pdf(pages, args.output, xobjects=args.xobjects)
+    if args.text:
+        with open(args.text, "w", encoding="utf-8") as f:
+            f.write("\f".join(page_texts(pages)))
+    print(f"{args.output}: {len(pages)} pages, {args.students} students")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,20 +3,103 @@ import pandas as pd
 import sys
 import traceback
 import os
+import atexit
+import contextlib
+import functools
+import itertools
+import json
 import logging
+import logging.handlers
+import queue
+import reprlib
+import threading
+import time
 from datetime import datetime
 
-# Set up logging
-log_dir = "logs"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+# Logging is configured by setup_logging(), not on import. APP_LOG_LEVEL
+# (e.g. DEBUG) switches it on for deployments without code changes.
+LOG_DIR = os.environ.get("APP_LOG_DIR", "logs")
+LOG_FILE = "app_debug.log"
+LOG_LEVEL = os.environ.get("APP_LOG_LEVEL", "")
+LOG_MAX_BYTES = int(os.environ.get("APP_LOG_MAX_MB", "10")) * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
-log_file = os.path.join(log_dir, f"app_debug_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-logging.basicConfig(
-    filename=log_file,
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Longest argument/result repr debug_function will log
+MAX_REPR_CHARS = 300
+
+_listener = None
+_setup_lock = threading.Lock()
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    # A full queue means the writer thread can't keep up with the disk:
+    # drop the record rather than block the caller
+    dropped = 0
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+def setup_logging(level=None, log_dir=LOG_DIR, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                  use_queue=True):
+    """Send log records to a size-capped, rotating file in log_dir.
+
+    With use_queue (the default) callers only put records on a bounded queue
+    and a background thread does the file I/O. level defaults to APP_LOG_LEVEL;
+    without either nothing is configured. Calling it again is a no-op.
+    Returns True if logging is (now) configured.
+    """
+    global _listener
+    level = level or LOG_LEVEL
+    if not level:
+        return False
+    with _setup_lock:
+        root = logging.getLogger()
+        if _listener is not None or any(getattr(h, "_app_log", False) for h in root.handlers):
+            return True
+        
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, LOG_FILE), maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        if use_queue:
+            handler = _DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+            _listener = logging.handlers.QueueListener(handler.queue, file_handler)
+            _listener.start()
+            atexit.register(stop_logging)
+        else:
+            handler = file_handler
+        handler._app_log = True
+        root.addHandler(handler)
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+    return True
+
+def stop_logging():
+    """Flush queued records and stop the background writer"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+_short_repr = reprlib.Repr()
+_short_repr.maxstring = 80
+_short_repr.maxother = 80
+_short_repr.maxlist = _short_repr.maxtuple = _short_repr.maxdict = _short_repr.maxset = 5
+_short_repr.maxlevel = 3
+
+def short_repr(value, max_chars=MAX_REPR_CHARS):
+    """repr() that stays small for big containers (e.g. the whole student list)"""
+    if isinstance(value, pd.DataFrame):
+        text = f"<DataFrame {value.shape[0]}x{value.shape[1]}>"
+    else:
+        text = _short_repr.repr(value)
+    if len(text) > max_chars:
+        text = f"{text[:max_chars]}...<{len(text) - max_chars} more chars>"
+    return text
 
 def setup_exception_handler():
     """Set up a global exception handler to log unhandled exceptions"""
@@ -32,6 +115,8 @@ def setup_exception_handler():
 
 def debug_dataframe(df, description="DataFrame"):
     """Log detailed information about a DataFrame"""
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
     logging.debug(f"--- {description} Debug Info ---")
     logging.debug(f"Shape: {df.shape}")
     logging.debug(f"Columns: {df.columns.tolist()}")
@@ -52,20 +137,37 @@ def debug_dataframe(df, description="DataFrame"):
         if col.endswith('_GRD_PNT') or col.endswith('_CRD_PNT') or col == 'SGPA':
             logging.debug(f"Column {col} unique values: {df[col].unique()}")
 
-def debug_function(func):
-    """Decorator to debug a function's execution"""
+def debug_function(func=None, *, sample_every=1, max_repr=MAX_REPR_CHARS):
+    """Decorator to debug a function's execution.
+
+    Arguments are logged as truncated reprs. For hot functions, sample_every=N
+    logs only every Nth call; errors are always logged. Usable bare
+    (@debug_function) or with options (@debug_function(sample_every=100)).
+    """
+    if func is None:
+        return functools.partial(debug_function, sample_every=sample_every, max_repr=max_repr)
+    
+    logger = logging.getLogger(func.__module__)
+    calls = itertools.count()
+    
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logging.debug(f"Calling function: {func.__name__}")
-        logging.debug(f"Arguments: {args}")
-        logging.debug(f"Keyword arguments: {kwargs}")
+        traced = logger.isEnabledFor(logging.DEBUG) and next(calls) % sample_every == 0
+        if traced:
+            logger.debug("Calling function: %s", func.__name__)
+            logger.debug("Arguments: %s", ", ".join(short_repr(arg, max_repr) for arg in args))
+            logger.debug("Keyword arguments: %s",
+                         ", ".join(f"{key}={short_repr(value, max_repr)}" for key, value in kwargs.items()))
+            start = time.perf_counter()
         try:
             result = func(*args, **kwargs)
-            logging.debug(f"Function {func.__name__} completed successfully")
-            return result
         except Exception as e:
-            logging.error(f"Error in function {func.__name__}: {str(e)}")
-            logging.error(traceback.format_exc())
+            logger.error("Error in function %s: %s", func.__name__, str(e)[:max_repr])
+            logger.error(traceback.format_exc())
             raise
+        if traced:
+            logger.debug("Function %s completed successfully in %.3f s", func.__name__, time.perf_counter() - start)
+        return result
     return wrapper
 
 # Function to analyze SGPA column
@@ -91,4 +193,117 @@ def analyze_sgpa_column(df):
             if value not in (None, pd.NA, "-----", "N/A"):
                 analysis["non_numeric_values"].append(value)
     
-    return analysis
\ No newline at end of file
+    return analysis
+
+# Run instrumentation
+#
+# Named timers ("spans") and counters for the extraction pipeline. Disabled
+# by default: span() then returns a shared no-op context manager and count()
+# returns straight away, so instrumented code pays one attribute check.
+# Set EXTRACTION_METRICS=1 or call metrics.enable() to collect.
+
+class _Span:
+    __slots__ = ("metrics", "name", "start")
+    
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+_NULL_SPAN = contextlib.nullcontext()
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else None
+
+def current_rss():
+    """Resident memory of this process in bytes, or None where it can't be read"""
+    if _PAGE_SIZE is not None:
+        try:
+            with open("/proc/self/statm", "rb") as f:
+                return int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+class Metrics:
+    """Process-wide timers, counters and peak values, exported with summary() / write_json()"""
+    
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def enable(self, enabled=True):
+        self.enabled = enabled
+    
+    def reset(self):
+        with self._lock:
+            self.timers = {}  # name -> [calls, seconds]
+            self.counters = {}
+            self.peaks = {}
+            self.started_at = time.time()
+    
+    def span(self, name):
+        """Context manager timing the enclosed block under name"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+    
+    def add_time(self, name, seconds, calls=1):
+        with self._lock:
+            timer = self.timers.setdefault(name, [0, 0.0])
+            timer[0] += calls
+            timer[1] += seconds
+    
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def peak(self, name, value):
+        """Keep the highest value seen under name (e.g. resident memory)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if value > self.peaks.get(name, value - 1):
+                self.peaks[name] = value
+    
+    def summary(self):
+        """Snapshot as a JSON-serialisable dict"""
+        with self._lock:
+            return {
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+                "elapsed_seconds": round(time.time() - self.started_at, 3),
+                "timers": {name: {"calls": calls, "seconds": round(seconds, 6)}
+                           for name, (calls, seconds) in sorted(self.timers.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "peaks": dict(sorted(self.peaks.items())),
+            }
+    
+    def merge(self, summary):
+        """Add a summary collected elsewhere (e.g. in a worker process)"""
+        for name, timer in summary["timers"].items():
+            self.add_time(name, timer["seconds"], timer["calls"])
+        with self._lock:
+            for name, amount in summary["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+            for name, value in summary.get("peaks", {}).items():
+                self.peaks[name] = max(value, self.peaks.get(name, value))
+    
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+metrics = Metrics(enabled=os.environ.get("EXTRACTION_METRICS", "") not in ("", "0"))
+
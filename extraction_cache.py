@@ -0,0 +1,204 @@
+# extraction_cache.py
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+# Where cached extractions live and how much disk they may use; both can be
+# overridden from the environment for deployments
+CACHE_DIR = os.environ.get("EXTRACTION_CACHE_DIR", "extraction_cache")
+CACHE_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+CACHE_SUFFIX = ".json.gz"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_pdf(pdf_source):
+    """Return the SHA-256 hex digest of a PDF's bytes.
+
+    pdf_source is a path, a bytes-like buffer (hashed in place) or a binary
+    file object (hashed from the start, its position left unchanged).
+    """
+    if isinstance(pdf_source, (str, os.PathLike)):
+        with open(pdf_source, "rb") as f:
+            return _hash_file(f)
+    try:
+        view = memoryview(pdf_source)
+    except TypeError:
+        position = pdf_source.tell()
+        try:
+            pdf_source.seek(0)
+            return _hash_file(pdf_source)
+        finally:
+            pdf_source.seek(position)
+    with view:
+        return hashlib.sha256(view).hexdigest()
+
+
+def _hash_file(f):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_records(records):
+    """Pack student dicts into a compact column-table layout.
+
+    Every record repeats mostly the same ~100 keys, so keys are stored once in
+    a shared column list and each row becomes a flat [col_index, value, ...]
+    list. Pair order follows each record's own key order so it round-trips exactly.
+    """
+    columns = []
+    column_index = {}
+    rows = []
+    for record in records:
+        row = []
+        for key, value in record.items():
+            index = column_index.get(key)
+            if index is None:
+                index = column_index[key] = len(columns)
+                columns.append(key)
+            row.append(index)
+            row.append(value)
+        rows.append(row)
+    return {"columns": columns, "rows": rows}
+
+
+def decode_records(payload):
+    """Inverse of encode_records"""
+    columns = payload["columns"]
+    return [
+        {columns[row[i]]: row[i + 1] for i in range(0, len(row), 2)}
+        for row in payload["rows"]
+    ]
+
+
+class ExtractionCache:
+    """On-disk cache of extracted student records keyed by PDF content.
+
+    Entries are gzip-compressed JSON files named after the cache key. The file
+    modification time doubles as the LRU clock: a hit touches the entry, and
+    after every write the least recently used entries are evicted until the
+    directory fits in max_bytes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(pdf_hash, parser_version):
+        return f"{pdf_hash}-v{parser_version}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        """Return the cached records for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                records = decode_records(json.load(f))
+            # Mark as recently used for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            records = None
+        except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+            # Truncated or corrupt entry: drop it and treat as a miss
+            print(f"Discarding unreadable cache entry {path}: {str(e)}")
+            self._remove(path)
+            records = None
+
+        with self._lock:
+            if records is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return records
+
+    def put(self, key, records):
+        """Store records under key; failures are reported but never raised"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(encode_records(records), f, separators=(",", ":"))
+            # Atomic rename so concurrent readers never see a half-written entry
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write cache entry {path}: {str(e)}")
+            self._remove(tmp_path)
+            return
+        self._evict(keep=path)
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(CACHE_SUFFIX):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _evict(self, keep=None):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            if self._remove(path):
+                total -= size
+                with self._lock:
+                    self.evictions += 1
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "size_bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache shared by the app and direct extractor callers"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ExtractionCache()
+        return _default_cache
@@ -0,0 +1,194 @@
+# job_queue.py
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from debug_utils import metrics
+from pdf_extractor import extract_tables_from_pdf, worker_pool_options
+
+# Pool size and the cap on queued + running jobs; beyond the cap new uploads
+# are turned away instead of piling up behind the ones already waiting
+JOB_WORKERS = int(os.environ.get("APP_JOB_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_ACTIVE_JOBS = int(os.environ.get("APP_MAX_JOBS", "8"))
+# Finished jobs whose results stay available for retrieval
+KEEP_FINISHED_JOBS = 16
+
+
+class QueueFullError(RuntimeError):
+    """Raised by JobManager.submit when MAX_ACTIVE_JOBS are already queued or running"""
+
+
+def _run_extraction(job_id, pdf_bytes, progress, started, collect_metrics):
+    # Runs in a pool process; progress and started are Manager dicts shared
+    # with the app. The PDF arrives as bytes and is parsed in memory, never
+    # written to disk. Pool workers are long-lived, so metrics collection is
+    # switched back afterwards rather than leaking into the next job.
+    started[job_id] = time.time()
+    was_enabled = metrics.enabled
+    if collect_metrics:
+        metrics.reset()
+        metrics.enable()
+
+    def report_progress(stage, done, total, students_found):
+        progress[job_id] = (stage, done, total, students_found)
+
+    try:
+        students = extract_tables_from_pdf(pdf_bytes, progress_callback=report_progress)
+        return students, metrics.summary() if collect_metrics else None
+    finally:
+        metrics.enable(was_enabled)
+
+
+class Job:
+    __slots__ = ("job_id", "future", "submitted_at", "started_at", "finished_at")
+
+    def __init__(self, job_id, future):
+        self.job_id = job_id
+        self.future = future
+        self.submitted_at = time.time()
+        # Set from the worker's own record once it picks the job up; a future
+        # waiting in the pool's call queue already counts as running
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def state(self):
+        if not self.future.done():
+            return "running" if self.started_at is not None else "queued"
+        return "failed" if self.future.exception() is not None else "done"
+
+    @property
+    def reusable(self):
+        """Whether a new submit of the same upload can share this job.
+
+        extract_tables_from_pdf reports errors as an empty result, so a job
+        that found no students is retried like a failed one.
+        """
+        state = self.state
+        return state in ("queued", "running") or (state == "done" and bool(self.future.result()[0]))
+
+
+class JobManager:
+    """Extraction jobs on a shared, bounded process pool.
+
+    Jobs are identified by the PDF content hash, so identical uploads that
+    arrive while a job is queued, running or recently finished share it.
+    The pool uses the spawn start method: forking a threaded web server can
+    deadlock the children. In low-memory mode every job gets a fresh process.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_active=MAX_ACTIVE_JOBS, keep_finished=KEEP_FINISHED_JOBS):
+        self.workers = workers
+        self.max_active = max_active
+        self.keep_finished = keep_finished
+        self._context = multiprocessing.get_context("spawn")
+        self._executor = self._new_executor()
+        self._manager = self._context.Manager()
+        self._progress = self._manager.dict()
+        self._started = self._manager.dict()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job_id, pdf_bytes, collect_metrics=False):
+        """Queue an extraction of pdf_bytes under job_id (the content hash) and return job_id"""
+        with self._lock:
+            self._sync_started()
+            job = self._jobs.get(job_id)
+            if job is not None and job.reusable:
+                self._jobs.move_to_end(job_id)
+                return job_id
+            if self._active_count() >= self.max_active:
+                raise QueueFullError(f"{self.max_active} extraction jobs are already queued or running")
+
+            self._progress[job_id] = ("queued", 0, 1, 0)
+            self._started.pop(job_id, None)
+            future = self._submit(job_id, pdf_bytes, collect_metrics)
+            job = self._jobs[job_id] = Job(job_id, future)
+            future.add_done_callback(lambda _, job=job: self._finish(job))
+            self._prune()
+        return job_id
+
+    def _submit(self, job_id, pdf_bytes, collect_metrics):
+        try:
+            return self._executor.submit(_run_extraction, job_id, pdf_bytes, self._progress, self._started,
+                                         collect_metrics)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool
+            print("Extraction pool was broken, restarting it")
+            self._executor = self._new_executor()
+            return self._executor.submit(_run_extraction, job_id, pdf_bytes, self._progress, self._started,
+                                         collect_metrics)
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context, **worker_pool_options())
+
+    def _finish(self, job):
+        job.finished_at = time.time()
+
+    def _sync_started(self):
+        # Copy the start times recorded by the workers onto their jobs (one
+        # round trip to the manager process)
+        started = dict(self._started)
+        for job_id, started_at in started.items():
+            job = self._jobs.get(job_id)
+            if job is not None and job.started_at is None:
+                job.started_at = started_at
+
+    def _active_count(self):
+        return sum(1 for job in self._jobs.values() if not job.future.done())
+
+    def _prune(self):
+        # Drop the oldest finished jobs beyond keep_finished
+        finished = [job_id for job_id, job in self._jobs.items() if job.future.done()]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+            self._progress.pop(job_id, None)
+            self._started.pop(job_id, None)
+
+    def status(self, job_id):
+        """State and progress of a job, or None if it is unknown (or long finished)"""
+        with self._lock:
+            self._sync_started()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            state = job.state
+            ahead = sum(1 for other in self._jobs.values()
+                        if other.state == "queued" and other.submitted_at < job.submitted_at)
+        stage, done, total, students_found = self._progress.get(job_id, ("queued", 0, 1, 0))
+        return {
+            "state": state,
+            "stage": stage,
+            "done": done,
+            "total": total,
+            "students": students_found,
+            "jobs_ahead": ahead if state == "queued" else 0,
+            "elapsed": (job.finished_at or time.time()) - job.submitted_at,
+            "error": str(job.future.exception()) if state == "failed" else None,
+        }
+
+    def result(self, job_id):
+        """(students, metrics summary or None) of a finished job; raises the job's error if it failed"""
+        with self._lock:
+            job = self._jobs[job_id]
+        return job.future.result()
+
+    def stats(self):
+        with self._lock:
+            self._sync_started()
+            states = [job.state for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "max_active": self.max_active,
+            "queued": states.count("queued"),
+            "running": states.count("running"),
+            "finished": states.count("done") + states.count("failed"),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
@@ -1,365 +1,2205 @@
 # pdf_extractor.py
 import pdfplumber
+from pdfminer.pdfdevice import PDFTextDevice
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFObjRef, PDFStream, resolve1
+from pdfminer.psparser import PSKeyword, PSLiteral
+from pdfminer.utils import apply_matrix_rect
+import numpy as np
 import pandas as pd
 import re
 import os
+import sys
+import argparse
+import bisect
+import contextlib
+import gc
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import pickle
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from enum import IntEnum
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from extraction_cache import decode_records, encode_records, get_default_cache, hash_pdf
+from debug_utils import current_rss, debug_function, metrics
+
+# Bump whenever a parsing change alters the extracted records, so cached
+# extractions made by older code are not served any more
+PARSER_VERSION = 1
+
+# Pages handed to each worker task when extracting in parallel
+PAGES_PER_TASK = 25
+
+# Page text extractor used unless the caller picks one from TEXT_BACKENDS
+DEFAULT_BACKEND = "pdfplumber"
+
+# Patterns are compiled once here rather than per page / per student
+PRN_PATTERN = re.compile(r"PRN:(\S+)\s+SEAT NO.:(\S+)\s+NAME:([^\n]+?)(?:\s+Mother(?:Name)?[\s-]*([^\n]*))?(?:\s+Semester|First\s+Semester|\s*\n)", re.DOTALL | re.IGNORECASE)
+SEMESTER_PATTERN = re.compile(r"Semester\s*:\s*(\d+)", re.IGNORECASE)
+SGPA_PATTERN = re.compile(r"First Semester SGPA\s*:\s*([\d.-]+|-----)")
+CREDITS_PATTERN = re.compile(r"Credits Earned/Total\s*:\s*(\d+/\d+)")
+TOTAL_POINTS_PATTERN = re.compile(r"Total Credit Points\s*:\s*(\d+)")
+
+# Subject lines start with course codes like AEC-101, AEC-101-ABC or AEC-101_TW
+SUBJECT_LINE_PATTERN = re.compile(r"^[A-Z]{3}-\d+(?:-[A-Z]{3})?(?:-\d+)?(?:_TW)?")
+GRADES = frozenset(["A+", "A", "B+", "B", "C+", "C", "D", "E", "F", "O", "FFF"])
+
+# Student-level columns, in output order
+BASE_COLUMNS = ("PRN", "Seat No", "Name", "Mother Name", "Semester", "SGPA",
+                "Credits Earned/Total", "Total Credit Points")
+
+# Column suffixes for the nine values parsed from every subject line, in order
+SUBJECT_FIELDS = ("_CCE", "_ESE", "_TW", "_TOT", "_CRD", "_ERN_CRD", "_GRD", "_GRD_PNT", "_CRD_PNT")
 
 # Function to extract tables directly from PDF
-def extract_tables_from_pdf(pdf_path):
-    all_students_data = []
-    
+#
+# pdf_source is anything open_pdf_source accepts: a path, a bytes-like buffer
+# or a binary file object.
+#
+# progress_callback, if given, is called as
+#   progress_callback(stage, done, total, students_found)
+# where stage is "extracting" (done/total count pages) or "cached" (the
+# records came straight from the extraction cache).
+@debug_function
+def extract_tables_from_pdf(pdf_source, workers=None, use_cache=True, progress_callback=None,
+                            backend=DEFAULT_BACKEND, start_page=0, end_page=None, layout=False):
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                print(f"Processing page {page_num} of {len(pdf.pages)}...")
-                
-                # Extract text to find student headers
-                page_text = page.extract_text()
-                
-                # Find all student entries on this page - improved pattern
-                prn_pattern = re.compile(r"PRN:(\S+)\s+SEAT NO.:(\S+)\s+NAME:([^\n]+?)(?:\s+Mother(?:Name)?[\s-]*([^\n]*))?(?:\s+Semester|First\s+Semester|\s*\n)", re.DOTALL | re.IGNORECASE)
-                prn_matches = list(prn_pattern.finditer(page_text))
-                
-                for i, match in enumerate(prn_matches):
-                    # Extract basic student information
-                    prn = match.group(1)
-                    seat_no = match.group(2)
-                    name = match.group(3).strip()
-                    mother_name = match.group(4).strip() if match.group(4) else ""
-                    
-                    # Find the student's text section
-                    start_pos = match.start()
-                    end_pos = prn_matches[i+1].start() if i < len(prn_matches) - 1 else len(page_text)
-                    student_text = page_text[start_pos:end_pos]
-                    
-                    # Extract semester information - updated pattern
-                    semester_pattern = re.compile(r"Semester\s*:\s*(\d+)", re.IGNORECASE)
-                    semester_match = semester_pattern.search(student_text)
-                    semester = semester_match.group(1) if semester_match else ""
-                    
-                    # Extract SGPA and credits info - updated patterns
-                    sgpa_pattern = re.compile(r"First Semester SGPA\s*:\s*([\d.-]+|-----)")
-                    sgpa_match = sgpa_pattern.search(student_text)
-                    sgpa = sgpa_match.group(1) if sgpa_match else "N/A"
-                    
-                    credits_pattern = re.compile(r"Credits Earned/Total\s*:\s*(\d+/\d+)")
-                    credits_match = credits_pattern.search(student_text)
-                    credits_earned = credits_match.group(1) if credits_match else ""
-                    
-                    total_points_pattern = re.compile(r"Total Credit Points\s*:\s*(\d+)")
-                    total_points_match = total_points_pattern.search(student_text)
-                    total_credit_points = total_points_match.group(1) if total_points_match else ""
-                    
-                    # Parse subject data more precisely with improved function
-                    subjects_data = parse_subjects_from_text(student_text)
-                    
-                    # Create student data dictionary
-                    student_data = {
-                        "PRN": prn,
-                        "Seat No": seat_no,
-                        "Name": name,
-                        "Mother Name": mother_name,
-                        "Semester": semester,
-                        "SGPA": sgpa,
-                        "Credits Earned/Total": credits_earned,
-                        "Total Credit Points": total_credit_points,
-                        **subjects_data
-                    }
-                    
-                    all_students_data.append(student_data)
+        # Identical PDFs (re-uploads, re-downloads) are served from the cache
+        cache = get_default_cache() if use_cache else None
+        if cache is not None:
+            parser_version = PARSER_VERSION if backend == DEFAULT_BACKEND else f"{PARSER_VERSION}-{backend}"
+            if layout:
+                parser_version = f"{parser_version}-layout"
+            if start_page or end_page is not None:
+                parser_version = f"{parser_version}-pages{start_page}-{end_page}"
+            cache_key = cache.make_key(hash_pdf(pdf_source), parser_version)
+            cached_data = cache.get(cache_key)
+            if cached_data is not None:
+                print(f"Loaded {len(cached_data)} students from extraction cache")
+                if progress_callback is not None:
+                    progress_callback("cached", 1, 1, len(cached_data))
+                return cached_data
         
+        all_students_data = list(iter_students(pdf_source, workers=workers, progress_callback=progress_callback,
+                                               backend=backend, start_page=start_page, end_page=end_page,
+                                               layout=layout))
         print(f"Total students processed from PDF: {len(all_students_data)}")
+        
+        if cache is not None:
+            cache.put(cache_key, all_students_data)
         return all_students_data
                     
     except Exception as e:
+        metrics.count("errors")
         print(f"Error processing PDF tables: {str(e)}")
         return []
 
+def iter_students(pdf_source, workers=None, progress_callback=None, as_records=False, backend=DEFAULT_BACKEND,
+                  start_page=0, end_page=None, layout=False):
+    """Yield student records one at a time, in page order, as each page is parsed.
+
+    Nothing is accumulated here, so memory stays flat however long the PDF is.
+    Records are wide dicts, or compact StudentRecord objects with as_records=True.
+    backend names the page text extractor in TEXT_BACKENDS. start_page and
+    end_page (0-based, end exclusive) limit extraction to a page range.
+    layout=True reads subject rows by column position (see ColumnTemplates).
+    Errors are raised to the caller; extract_tables_from_pdf is the forgiving wrapper.
+    """
+    if workers is not None and workers > 1:
+        yield from _iter_parallel(pdf_source, workers, progress_callback, as_records, backend, start_page, end_page,
+                                  layout)
+        return
+    
+    students_found = 0
+    with open_text_backend(pdf_source, backend) as pages:
+        total_pages = len(pages)
+        start, end = page_span(total_pages, start_page, end_page)
+        for page_num, page_students in enumerate(_iter_page_students(pages, start, end, as_records, layout),
+                                                 start + 1):
+            print(f"Processing page {page_num} of {total_pages}...")
+            students_found += len(page_students)
+            metrics.count("pages")
+            metrics.count("students", len(page_students))
+            if progress_callback is not None:
+                progress_callback("extracting", page_num - start, end - start, students_found)
+            yield from page_students
+        if pages.memory is not None:
+            report_memory([pages.memory.figures()])
+
+def _iter_page_students(pages, start, end, as_records=False, layout=False):
+    # The parsed students of each page of an open text backend
+    if layout:
+        templates = ColumnTemplates()
+        return (_parse_page_layout(lines, templates, as_records) for lines in pages.iter_lines(start, end))
+    parse_page = _parse_page_records if as_records else _parse_page_text
+    return (parse_page(page_text) for page_text in pages.iter_texts(start, end))
+
+def page_span(total_pages, start_page=0, end_page=None):
+    """Clamp a 0-based, end-exclusive page range to the document; returns (start, end)"""
+    if start_page < 0 or (end_page is not None and end_page < start_page):
+        raise ValueError(f"Invalid page range {start_page}-{end_page}")
+    end = total_pages if end_page is None else min(end_page, total_pages)
+    return min(start_page, end), end
+
+def shard_pages(total_pages, index, count):
+    """Page range (start, end) of shard index (0-based) when the document is split evenly into count shards"""
+    if not 0 <= index < count:
+        raise ValueError(f"Shard {index + 1} of {count} does not exist")
+    return total_pages * index // count, total_pages * (index + 1) // count
+
+def _page_ranges(total_pages, workers, first_page=0):
+    # Split the document (or the pages from first_page on) into contiguous
+    # (start, end) page ranges, small enough that every worker gets several
+    # of them and slow pages even out
+    chunk = max(1, min(PAGES_PER_TASK, -(-(total_pages - first_page) // (workers * 4))))
+    return [(start, min(start + chunk, total_pages)) for start in range(first_page, total_pages, chunk)]
+
+# PDF bytes handed to each worker once by _init_worker_source, for sources
+# that aren't paths the workers could open themselves
+_worker_source = None
+
+def _init_worker_source(pdf_bytes):
+    global _worker_source
+    _worker_source = pdf_bytes
+
+def _extract_page_range(pdf_path, start, end, as_records=False, backend=DEFAULT_BACKEND, collect_metrics=False,
+                        layout=False):
+    # Runs in a worker process: each worker opens the PDF itself so only the
+    # path and the parsed records (plus its metrics, if asked) cross the
+    # process boundary. pdf_path is None when the bytes came with the worker.
+    if pdf_path is None:
+        pdf_path = _worker_source
+    if collect_metrics:
+        metrics.reset()
+        metrics.enable()
+    students = []
+    with open_text_backend(pdf_path, backend) as pages:
+        for page_students in _iter_page_students(pages, start, end, as_records, layout):
+            metrics.count("pages")
+            metrics.count("students", len(page_students))
+            students.extend(page_students)
+    memory = pages.memory.figures() if pages.memory is not None else None
+    return students, metrics.summary() if collect_metrics else None, memory
+
+def _iter_parallel(pdf_source, workers, progress_callback=None, as_records=False, backend=DEFAULT_BACKEND,
+                   start_page=0, end_page=None, layout=False):
+    with open_text_backend(pdf_source, backend) as pages:
+        total_pages = len(pages)
+    
+    span_start, span_end = page_span(total_pages, start_page, end_page)
+    ranges = _page_ranges(span_end, workers, span_start)
+    if _is_path(pdf_source):
+        pdf_path, initializer, initargs = pdf_source, None, ()
+    else:
+        # Ship the bytes once per worker rather than once per page range
+        pdf_path, initializer, initargs = None, _init_worker_source, (_source_bytes(pdf_source),)
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(ranges) or 1),
+                                   initializer=initializer, initargs=initargs)
+    # Only keep a couple of ranges per worker in flight so finished results
+    # don't pile up in memory while the consumer is still busy
+    max_in_flight = workers * 2
+    pending = deque()
+    students_found = 0
+    memory = []
+    try:
+        for start, end in ranges:
+            pending.append((start, end, executor.submit(_extract_page_range, pdf_path, start, end, as_records, backend,
+                                                               metrics.enabled, layout)))
+            # Draining in submission order keeps the records in original page order
+            while pending and (len(pending) >= max_in_flight or end == span_end):
+                done_start, done_end, future = pending.popleft()
+                students, worker_metrics, worker_memory = future.result()
+                memory.append(worker_memory)
+                print(f"Processed pages {done_start + 1}-{done_end} of {total_pages}...")
+                students_found += len(students)
+                if worker_metrics is not None:
+                    metrics.merge(worker_metrics)
+                if progress_callback is not None:
+                    progress_callback("extracting", done_end - span_start, span_end - span_start, students_found)
+                yield from students
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    report_memory(memory)
+
+# PDF sources
+#
+# Everything that opens a PDF takes a path, a bytes-like buffer (bytes,
+# bytearray, memoryview, mmap) or a seekable binary file object such as an
+# upload, so in-memory PDFs never have to be written to a temp file first.
+# Paths are memory-mapped: the parser's many small seeks and reads then hit
+# the page cache directly instead of going through buffered file reads.
+
+def _is_path(pdf_source):
+    return isinstance(pdf_source, (str, os.PathLike))
+
+class BufferReader(io.RawIOBase):
+    """Read-only binary file over a bytes-like buffer; reads copy only the bytes asked for"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        start = min(self._pos, len(self._view))
+        end = len(self._view) if size is None or size < 0 else min(start + size, len(self._view))
+        self._pos = end
+        return self._view[start:end].tobytes()
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._pos = offset
+        return offset
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+@contextlib.contextmanager
+def open_pdf_source(pdf_source):
+    """Yield a seekable binary file object reading pdf_source without copying it.
+
+    File objects are used as they are and left open for their owner.
+    """
+    if _is_path(pdf_source):
+        with open(pdf_source, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Empty files and pipes can't be mapped
+                mapped = None
+            if mapped is None:
+                yield f
+            else:
+                with mapped:
+                    yield mapped
+    elif isinstance(pdf_source, bytes):
+        # BytesIO shares an immutable bytes object rather than copying it
+        yield io.BytesIO(pdf_source)
+    elif isinstance(pdf_source, (bytearray, memoryview)):
+        with BufferReader(pdf_source) as reader:
+            yield reader
+    else:
+        # File objects, including mmaps, are read in place
+        yield pdf_source
+
+def _source_bytes(pdf_source):
+    # A picklable copy of a non-path source, for worker processes
+    if isinstance(pdf_source, bytes):
+        return pdf_source
+    if isinstance(pdf_source, (bytearray, memoryview, mmap.mmap)):
+        return bytes(pdf_source)
+    position = pdf_source.tell()
+    try:
+        pdf_source.seek(0)
+        return pdf_source.read()
+    finally:
+        pdf_source.seek(position)
+
+# Page pre-filter
+#
+# Cover pages, grade legends and signature pages hold no "PRN:" blocks, but
+# text extraction and every regex still ran on them. page_may_have_students
+# decides from the page's raw content stream instead: a page can only hold a
+# student if "PRN" is shown somewhere on it. When all text is drawn from
+# literal strings in simple single-byte fonts, those strings are the text,
+# so a page whose strings don't spell "PRN" is skipped. Anything the raw
+# bytes can't vouch for (hex strings, escapes, nested parentheses, composite
+# or Type3 fonts, custom encodings, ToUnicode maps, form XObjects) keeps the
+# page, so the filter never drops a page the full extraction would parse.
+
+# Set EXTRACTION_PAGE_FILTER=0 to extract every page regardless
+PAGE_PREFILTER = os.environ.get("EXTRACTION_PAGE_FILTER", "1") != "0"
+
+_PRN_BYTES_PATTERN = re.compile(rb"PRN", re.IGNORECASE)
+_HEX_STRING_PATTERN = re.compile(rb"<[0-9A-Fa-f\s]*>")
+_NESTED_STRING_PATTERN = re.compile(rb"\([^)]*\(")
+_LITERAL_STRING_PATTERN = re.compile(rb"\(([^()]*)\)")
+_SIMPLE_FONT_TYPES = frozenset(["Type1", "MMType1", "TrueType"])
+_SIMPLE_ENCODINGS = frozenset(["WinAnsiEncoding", "MacRomanEncoding", "StandardEncoding", "PDFDocEncoding"])
+
+def _literal_name(value):
+    return getattr(resolve1(value), "name", None)
+
+def _plain_text_resources(resources):
+    # True when every font maps string bytes to the characters they spell and
+    # no form XObject can draw text outside the page's own content stream
+    for xobject in (resolve1(resources.get("XObject")) or {}).values():
+        xobject = resolve1(xobject)
+        if not isinstance(xobject, PDFStream) or _literal_name(xobject.get("Subtype")) != "Image":
+            return False
+    for font in (resolve1(resources.get("Font")) or {}).values():
+        font = resolve1(font)
+        if not isinstance(font, dict) or _literal_name(font.get("Subtype")) not in _SIMPLE_FONT_TYPES:
+            return False
+        if "ToUnicode" in font:
+            return False
+        encoding = font.get("Encoding")
+        if encoding is None:
+            # Without an encoding only the unembedded standard fonts are predictable
+            if "FontDescriptor" in font:
+                return False
+        elif _literal_name(encoding) not in _SIMPLE_ENCODINGS:
+            return False
+    return True
+
+def page_may_have_students(page):
+    """False only when a pdfminer PDFPage certainly shows no "PRN" (and so has no student entries)"""
+    try:
+        data = b"".join(resolve1(stream).get_data() for stream in page.contents)
+        if _PRN_BYTES_PATTERN.search(data):
+            return True
+        if (b"\\" in data or _HEX_STRING_PATTERN.search(data) or _NESTED_STRING_PATTERN.search(data)
+                or not _plain_text_resources(page.resources or {})):
+            return True
+    except Exception:
+        return True
+    # Strings split for kerning or positioning are joined back up
+    return _PRN_BYTES_PATTERN.search(b"".join(_LITERAL_STRING_PATTERN.findall(data))) is not None
+
+def _skip_page(page):
+    # Classify a PDFPage for the text backends, counting the pages skipped
+    with metrics.span("page_filter"):
+        skip = not page_may_have_students(page)
+    if skip:
+        metrics.count("pages_skipped")
+    return skip
+
+# Low-memory mode
+#
+# The text backends always release a page's caches once its text is out;
+# pdfplumber otherwise keeps every page's chars and layout, several MB per
+# page, until the document is closed. Low-memory mode, for running several
+# long extractions side by side, goes further: resident memory is sampled
+# after every page and its peak reported, and when MEMORY_BUDGET_MB is
+# exceeded the backend closes and reopens the document, dropping pdfminer's
+# object, stream and font caches. Process pools started by the job queue
+# and batch runs also use a fresh worker process per file, so everything an
+# extraction allocated goes back to the system when it ends.
+
+LOW_MEMORY = os.environ.get("EXTRACTION_LOW_MEMORY", "") not in ("", "0")
+# 0 means no budget: memory is only tracked
+MEMORY_BUDGET_MB = float(os.environ.get("EXTRACTION_MEMORY_BUDGET_MB", "0"))
+# Pages processed before the document may be reopened again, so a budget
+# below what the process needs anyway doesn't reopen it on every page
+MIN_PAGES_PER_OPEN = 25
+
+def set_low_memory(enabled=True, budget_mb=None):
+    """Switch low-memory mode for this process and the worker processes it starts afterwards"""
+    global LOW_MEMORY, MEMORY_BUDGET_MB
+    LOW_MEMORY = enabled
+    os.environ["EXTRACTION_LOW_MEMORY"] = "1" if enabled else "0"
+    if budget_mb is not None:
+        MEMORY_BUDGET_MB = budget_mb
+        os.environ["EXTRACTION_MEMORY_BUDGET_MB"] = str(budget_mb)
+
+def worker_pool_options():
+    """Extra ProcessPoolExecutor arguments: one file per worker process in low-memory mode"""
+    # max_tasks_per_child is new in Python 3.11
+    if LOW_MEMORY and sys.version_info >= (3, 11):
+        return {"max_tasks_per_child": 1}
+    return {}
+
+class MemoryBudget:
+    """Resident memory of a low-memory extraction: peak tracking and the reopen decision"""
+
+    def __init__(self, budget_mb=None):
+        self.budget_mb = MEMORY_BUDGET_MB if budget_mb is None else budget_mb
+        self.peak_mb = 0.0
+        self.reopens = 0
+        self.pages = 0
+        self._pages_since_open = 0
+
+    def page_done(self):
+        """Sample RSS after a page; True when the document should be reopened"""
+        self.pages += 1
+        self._pages_since_open += 1
+        rss = current_rss()
+        if rss is None:
+            return False
+        rss_mb = rss / 2**20
+        if rss_mb > self.peak_mb:
+            self.peak_mb = rss_mb
+            metrics.peak("rss_mb", round(rss_mb, 1))
+        return (self.budget_mb > 0 and rss_mb > self.budget_mb
+                and self._pages_since_open >= MIN_PAGES_PER_OPEN)
+
+    def reopened(self):
+        self.reopens += 1
+        self._pages_since_open = 0
+        metrics.count("document_reopens")
+
+    def figures(self):
+        """(peak MB, reopens, pages) so far, for report_memory"""
+        return self.peak_mb, self.reopens, self.pages
+
+def report_memory(figures, budget_mb=None):
+    """Print one line for the MemoryBudget figures of an extraction (one entry per
+    opened backend); nothing when no page was processed or no budget is set"""
+    budget_mb = MEMORY_BUDGET_MB if budget_mb is None else budget_mb
+    figures = [entry for entry in figures if entry is not None]
+    pages = sum(entry[2] for entry in figures)
+    if not pages or budget_mb <= 0:
+        return
+    peak_mb = max(entry[0] for entry in figures)
+    reopens = sum(entry[1] for entry in figures)
+    print(f"Peak memory {peak_mb:.0f} MB (budget {budget_mb:.0f} MB) over {pages} pages, "
+          f"document reopened {reopens} times")
+
+# Page text backends
+#
+# The parsers only need the page text in reading order, one line per row of
+# the result sheet. pdfplumber builds a dict with ~20 attributes for every
+# character before assembling that text, which dominates extraction time.
+# The "pdfminer" backend drives pdfminer's interpreter with a device that
+# keeps just (top, x0, x1, text) per character and groups them into words
+# and lines with the same rules as pdfplumber's extract_text defaults.
+
+class PdfplumberText:
+    """Page texts from pdfplumber's extract_text (the reference backend)"""
+
+    def __init__(self, pdf_file, prefilter=PAGE_PREFILTER, low_memory=None):
+        self._pdf_file = pdf_file
+        self._pdf = pdfplumber.open(pdf_file)
+        self.prefilter = prefilter
+        self.memory = MemoryBudget() if (LOW_MEMORY if low_memory is None else low_memory) else None
+
+    def __len__(self):
+        return len(self._pdf.pages)
+
+    def iter_texts(self, start=0, end=None):
+        return self._iter_pages(start, end, lambda page: page.extract_text(), "")
+
+    def iter_lines(self, start=0, end=None):
+        """Per page, its text lines as lists of (x0, x1, word); see chars_to_lines"""
+        chars_of = lambda page: [(char["top"], char["x0"], char["x1"], char["text"]) for char in page.chars]
+        return self._iter_pages(start, end, lambda page: chars_to_lines(chars_of(page)), [])
+
+    def _iter_pages(self, start, end, extract, empty):
+        for index in range(*slice(start, end).indices(len(self))):
+            page = self._pdf.pages[index]
+            # Skipped pages yield empty results so page numbering stays intact
+            if self.prefilter and _skip_page(page.page_obj):
+                result = empty
+            else:
+                with metrics.span("text_extraction"):
+                    result = extract(page)
+            page.close()
+            if self.memory is not None and self.memory.page_done():
+                self._pdf.close()
+                gc.collect()
+                self._pdf = pdfplumber.open(self._pdf_file)
+                self.memory.reopened()
+            yield result
+
+    def close(self):
+        self._pdf.close()
+
+class _CharTupleDevice(PDFTextDevice):
+    # Collects (top, x0, x1, text) for every character instead of LTChar objects
+    def __init__(self, rsrcmgr):
+        super().__init__(rsrcmgr)
+        self.chars = []
+        self.page_height = 0
+
+    def begin_page(self, page, ctm):
+        x0, y0, x1, y1 = page.mediabox
+        self.page_height = abs(x1 - x0) if page.rotate % 180 else abs(y1 - y0)
+        self.chars = []
+
+    def render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate):
+        try:
+            text = font.to_unichr(cid)
+        except PDFUnicodeNotDefined:
+            text = f"(cid:{cid})"
+        adv = font.char_width(cid) * fontsize * scaling
+        # Same glyph box as pdfminer's LTChar
+        if font.is_vertical():
+            vx, vy = font.char_disp(cid)
+            vx = fontsize * 0.5 if vx is None else vx * fontsize * 0.001
+            vy = (1000 - vy) * fontsize * 0.001
+            bbox = (-vx, vy + rise + adv, -vx + fontsize, vy + rise)
+        else:
+            descent = font.get_descent() * fontsize
+            bbox = (0, descent + rise, adv, descent + rise + fontsize)
+        x0, y0, x1, y1 = apply_matrix_rect(matrix, bbox)
+        self.chars.append((self.page_height - max(y0, y1), min(x0, x1), max(x0, x1), text))
+        return adv
+
+LIGATURES = {"\ufb00": "ff", "\ufb03": "ffi", "\ufb04": "ffl", "\ufb01": "fi", "\ufb02": "fl",
+             "\ufb06": "st", "\ufb05": "st"}
+TEXT_TOLERANCE = 3
+
+def _line_numbers(tops, tolerance=TEXT_TOLERANCE):
+    # Number the lines of a page: distinct tops within tolerance of their
+    # neighbour belong to the same line
+    line_of = {}
+    line = -1
+    last_top = None
+    for top in sorted(set(tops)):
+        if last_top is None or top > last_top + tolerance:
+            line += 1
+        line_of[top] = line
+        last_top = top
+    return line_of
+
+def chars_to_lines(chars, tolerance=TEXT_TOLERANCE):
+    """Group (top, x0, x1, text) chars into the words and lines of pdfplumber's extract_text.
+
+    Returns one list of (x0, x1, word) per output line. Text is treated as
+    upright, left-to-right, which is how result sheets are printed.
+    """
+    line_of = _line_numbers([char[0] for char in chars], tolerance)
+    lines = [[] for _ in range(len(set(line_of.values())))]
+    for char in chars:
+        lines[line_of[char[0]]].append(char)
+    
+    words = []
+    for line_chars in lines:
+        line_chars.sort(key=lambda char: char[1])
+        word = []
+        word_top = word_x0 = word_x1 = prev = None
+        for char in line_chars:
+            top, x0, x1, text = char
+            if text.isspace():
+                new_word, char = True, None
+            else:
+                new_word = prev is not None and (x0 < prev[1] or x0 > prev[2] + tolerance
+                                                 or abs(top - prev[0]) > tolerance)
+            if new_word and word:
+                words.append((word_top, word_x0, word_x1, "".join(word)))
+                word = []
+            if char is None:
+                prev = None
+                continue
+            if word:
+                word_top, word_x1 = min(word_top, top), max(word_x1, x1)
+            else:
+                word_top, word_x0, word_x1 = top, x0, x1
+            word.append(LIGATURES.get(text, text))
+            prev = char
+        if word:
+            words.append((word_top, word_x0, word_x1, "".join(word)))
+    
+    # Words are regrouped into output lines in the order they were built, so a
+    # word whose top falls in a neighbouring line's band starts a new line
+    word_line_of = _line_numbers([word[0] for word in words], tolerance)
+    text_lines = []
+    current_line = None
+    for top, x0, x1, text in words:
+        if word_line_of[top] != current_line:
+            current_line = word_line_of[top]
+            text_lines.append([])
+        text_lines[-1].append((x0, x1, text))
+    return text_lines
+
+def chars_to_text(chars, tolerance=TEXT_TOLERANCE):
+    """Assemble (top, x0, x1, text) chars into page text exactly like pdfplumber's extract_text"""
+    return lines_to_text(chars_to_lines(chars, tolerance))
+
+def lines_to_text(lines):
+    """Page text of chars_to_lines output"""
+    return "\n".join(" ".join(word for _, _, word in line) for line in lines)
+
+class PdfminerText:
+    """Page texts straight from pdfminer's interpreter, without pdfplumber's per-char objects"""
+
+    def __init__(self, pdf_file, prefilter=PAGE_PREFILTER, low_memory=None):
+        self.prefilter = prefilter
+        self.memory = MemoryBudget() if (LOW_MEMORY if low_memory is None else low_memory) else None
+        self._pdf_file = pdf_file
+        self._open()
+
+    def _open(self):
+        # Everything pdfminer caches hangs off the document and the resource manager
+        document = PDFDocument(PDFParser(self._pdf_file))
+        self._pages = list(PDFPage.create_pages(document))
+        self._device = _CharTupleDevice(PDFResourceManager(caching=True))
+        self._interpreter = PDFPageInterpreter(self._device.rsrcmgr, self._device)
+
+    def __len__(self):
+        return len(self._pages)
+
+    def iter_texts(self, start=0, end=None):
+        return self._iter_pages(start, end, chars_to_text, "")
+
+    def iter_lines(self, start=0, end=None):
+        """Per page, its text lines as lists of (x0, x1, word); see chars_to_lines"""
+        return self._iter_pages(start, end, chars_to_lines, [])
+
+    def _iter_pages(self, start, end, assemble, empty):
+        for index in range(*slice(start, end).indices(len(self))):
+            page = self._pages[index]
+            if self.prefilter and _skip_page(page):
+                result = empty
+            else:
+                with metrics.span("text_extraction"):
+                    self._interpreter.process_page(page)
+                    result = assemble(self._device.chars)
+                    self._device.chars = []
+            if self.memory is not None and self.memory.page_done():
+                self._pages = self._device = self._interpreter = None
+                gc.collect()
+                self._open()
+                self.memory.reopened()
+            yield result
+
+    def close(self):
+        self._pages = []
+
+TEXT_BACKENDS = {
+    "pdfplumber": PdfplumberText,
+    "pdfminer": PdfminerText,
+}
+
+@contextlib.contextmanager
+def open_text_backend(pdf_source, backend=DEFAULT_BACKEND, prefilter=PAGE_PREFILTER, low_memory=None):
+    """Open pdf_source with the named text backend; yields an object with len(), iter_texts() and iter_lines().
+
+    With prefilter, pages page_may_have_students rules out come back as empty text.
+    low_memory (default: LOW_MEMORY) tracks memory and enforces MEMORY_BUDGET_MB.
+    """
+    try:
+        backend_class = TEXT_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown text backend {backend!r}; choose from {', '.join(TEXT_BACKENDS)}")
+    with open_pdf_source(pdf_source) as pdf_file:
+        pages = backend_class(pdf_file, prefilter, low_memory)
+        try:
+            yield pages
+        finally:
+            pages.close()
+
+def _student_blocks(page_text):
+    # Returns (header_fields, student_text, start) for every student entry on a
+    # page, header_fields being PRN, seat no, name, mother name, semester,
+    # SGPA, credits earned/total and total credit points, and start the offset
+    # of student_text in page_text
+    with metrics.span("header_regex"):
+        return _scan_student_blocks(page_text)
+
+def _scan_student_blocks(page_text):
+    blocks = []
+    # Find all student entries on this page
+    prn_matches = list(PRN_PATTERN.finditer(page_text))
+    
+    for i, match in enumerate(prn_matches):
+        # Extract basic student information
+        prn = match.group(1)
+        seat_no = match.group(2)
+        name = match.group(3).strip()
+        mother_name = match.group(4).strip() if match.group(4) else ""
+        
+        # Find the student's text section
+        start_pos = match.start()
+        end_pos = prn_matches[i+1].start() if i < len(prn_matches) - 1 else len(page_text)
+        student_text = page_text[start_pos:end_pos]
+        
+        # Extract semester, SGPA and credits info
+        semester_match = SEMESTER_PATTERN.search(student_text)
+        semester = semester_match.group(1) if semester_match else ""
+        
+        sgpa_match = SGPA_PATTERN.search(student_text)
+        sgpa = sgpa_match.group(1) if sgpa_match else "N/A"
+        
+        credits_match = CREDITS_PATTERN.search(student_text)
+        credits_earned = credits_match.group(1) if credits_match else ""
+        
+        total_points_match = TOTAL_POINTS_PATTERN.search(student_text)
+        total_credit_points = total_points_match.group(1) if total_points_match else ""
+        
+        blocks.append(((prn, seat_no, name, mother_name, semester, sgpa, credits_earned, total_credit_points),
+                       student_text, start_pos))
+    return blocks
+
+def _parse_page_text(page_text):
+    students = []
+    for header, student_text, _ in _student_blocks(page_text):
+        # Create student data dictionary
+        student_data = dict(zip(BASE_COLUMNS, header))
+        with metrics.span("subject_parsing"):
+            student_data.update(parse_subjects_from_text(student_text))
+        students.append(student_data)
+    return students
+
+def _parse_page_records(page_text):
+    records = []
+    for header, student_text, _ in _student_blocks(page_text):
+        with metrics.span("subject_parsing"):
+            records.append(StudentRecord(*header, subjects=parse_subject_results(student_text)))
+    return records
+
+def _iter_subject_lines(student_text):
+    # Yields the whitespace-split tokens of every subject line
+    subject_lines = 0
+    for line in student_text.split("\n"):
+        line = line.strip()
+        if not SUBJECT_LINE_PATTERN.match(line):
+            continue
+        
+        parts = line.split()
+        if len(parts) < 3:  # Need at least subject code and some data
+            continue
+        subject_lines += 1
+        yield parts
+    if metrics.enabled:
+        metrics.count("subject_lines", subject_lines)
+
+def _column_prefix(subject_code):
+    # Term Work lines (AEC-101_TW) get their own set of columns
+    if "_TW" in subject_code:
+        return f"{subject_code.replace('_TW', '')}_TW"
+    return subject_code
+
+def _add_subject_columns(subjects_data, column_prefix, values):
+    for suffix, value in zip(SUBJECT_FIELDS, values):
+        key = column_prefix + suffix
+        # A subject repeated for the same student gets numbered columns
+        if key in subjects_data:
+            i = 1
+            while f"{key}_{i}" in subjects_data:
+                i += 1
+            key = f"{key}_{i}"
+        subjects_data[key] = value
+
 def parse_subjects_from_text(student_text):
     subjects_data = {}
+    for parts in _iter_subject_lines(student_text):
+        _add_subject_columns(subjects_data, _column_prefix(parts[0]), _parse_subject_line(parts))
+    return subjects_data
+
+def parse_subject_results(student_text):
+    return tuple(
+        SubjectResult.from_values(parts[0], _parse_subject_line(parts))
+        for parts in _iter_subject_lines(student_text)
+    )
+
+def _parse_subject_line(parts):
+    # Single pass over the tokens of one subject line, returning the nine values
+    # in SUBJECT_FIELDS order. The grade token anchors everything after the
+    # marks; the marks themselves are the first numeric (or "---") tokens after
+    # the subject code, keeping a leading '*' for grace marks.
+    marks = []
+    grade_index = -1
+    for i in range(1, len(parts)):
+        part = parts[i]
+        if part in GRADES:
+            grade_index = i
+            break
+        if len(marks) < 3:
+            value = part.replace('*', '') if '*' in part else part
+            if value.isdigit() or value == "---":
+                marks.append(f"*{value}" if part[0] == '*' else value)
     
-    # Split into lines and find subject lines
-    lines = student_text.strip().split("\n")
-    subject_lines = []
+    if grade_index < 0:
+        if metrics.enabled:
+            metrics.count("parse_fallbacks")
+        # Without a grade we only trust the line if CCE, ESE and TW are all present
+        if len(marks) < 3:
+            return ("N/A",) * 9
+        return (marks[0], marks[1], marks[2]) + ("N/A",) * 6
     
-    # Find subject lines (they start with course codes like AEC-101)
-    for line in lines:
-        line = line.strip()
-        # Match standard subject code format
-        if re.match(r"^[A-Z]{3}-\d+(?:-[A-Z]{3})?(?:-\d+)?(?:_TW)?", line):
-            subject_lines.append(line)
+    cce = marks[0] if len(marks) >= 1 else "N/A"
+    ese = marks[1] if len(marks) >= 2 else "N/A"
+    tw = marks[2] if len(marks) >= 3 else "N/A"
     
-    # Track keys that have been added to avoid duplicates
-    added_keys = set()
+    # Grade is followed by grade point and credit point, and preceded by
+    # earned credits, credits and the total (which may carry a '*')
+    last = len(parts) - 1
+    grd = parts[grade_index]
+    grd_pnt = parts[grade_index + 1] if grade_index + 1 <= last and parts[grade_index + 1].isdigit() else "N/A"
+    crd_pnt = parts[grade_index + 2] if grade_index + 2 <= last and parts[grade_index + 2].isdigit() else "N/A"
+    ern_crd = parts[grade_index - 1]
+    crd = parts[grade_index - 2] if grade_index >= 2 else "N/A"
+    tot = parts[grade_index - 3] if grade_index >= 3 else "N/A"
+    if tot.startswith('*'):
+        tot = tot[1:]
     
-    # For each subject line, extract the data using a more precise approach
-    for line in subject_lines:
-        parts = re.split(r'\s+', line)
-        if len(parts) < 3:  # Need at least subject code and some data
+    return (cce, ese, tw, tot, crd, ern_crd, grd, grd_pnt, crd_pnt)
+
+# Layout-aware subject parsing
+#
+# _parse_subject_line works out which token is which field from their order
+# around the grade, so a row without a grade falls back to "N/A" and a blank
+# cell shifts the marks into the wrong fields. In layout mode the backends
+# hand over word x-positions (iter_lines) and subject rows are read as a
+# table instead: each word goes to the column its centre falls in. Column
+# templates come from the "CCE ESE TW ... CRD_PNT" header row and are cached
+# per header layout, so a document's table layout is learned once and every
+# later row is slotted without looking at its tokens. Sheets without header
+# rows learn the columns from their first complete rows. A row that doesn't
+# fit the template goes through _parse_subject_line as before.
+
+COLUMN_LABELS = tuple(field[1:] for field in SUBJECT_FIELDS)
+# Complete rows (code, nine values, grade in place) a template is learned
+# from when the sheet has no header rows
+TEMPLATE_SAMPLE_ROWS = 3
+
+class ColumnTemplate:
+    """x-ranges of the nine subject columns of one table layout.
+
+    Built from one (x0, x1) extent per column: neighbouring columns meet
+    halfway across the gap between them, and the outer ones reach half an
+    average gap beyond their extent.
+    """
+    __slots__ = ("starts", "limit")
+
+    def __init__(self, extents):
+        gaps = [b[0] - a[1] for a, b in zip(extents, extents[1:])]
+        margin = max(sum(gaps) / len(gaps), 0) / 2
+        self.starts = [extents[0][0] - margin] + [(a[1] + b[0]) / 2 for a, b in zip(extents, extents[1:])]
+        self.limit = extents[-1][1] + margin
+
+    def slot(self, words):
+        """The nine cells (word text or None) of a row's value words, or None if a
+        word lies outside the table or two words share a cell"""
+        cells = [None] * len(self.starts)
+        for x0, x1, word in words:
+            center = (x0 + x1) / 2
+            column = bisect.bisect_right(self.starts, center) - 1
+            if column < 0 or center > self.limit or cells[column] is not None:
+                return None
+            cells[column] = word
+        return cells
+
+class ColumnTemplates:
+    """The column templates of one document, learned once per table layout"""
+
+    def __init__(self):
+        self.current = None
+        self._by_layout = {}
+        self._samples = []
+
+    def see_header(self, words):
+        """Switch to the template of a column header row; False if words aren't one"""
+        texts = [word for _, _, word in words]
+        if "CCE" not in texts:
+            return False
+        first = texts.index("CCE")
+        labels = words[first:first + len(COLUMN_LABELS)]
+        if tuple(texts[first:first + len(COLUMN_LABELS)]) != COLUMN_LABELS:
+            return False
+        key = tuple(round(x0) for x0, _, _ in labels)
+        template = self._by_layout.get(key)
+        if template is None:
+            template = self._by_layout[key] = ColumnTemplate([(x0, x1) for x0, x1, _ in labels])
+            metrics.count("column_templates")
+        self.current = template
+        return True
+
+    def see_row(self, words):
+        """Learn from a subject row while there is no template yet"""
+        if (self.current is not None or len(words) != len(COLUMN_LABELS) + 1
+                or words[1 + COLUMN_LABELS.index("GRD")][2] not in GRADES):
+            return
+        self._samples.append(words[1:])
+        if len(self._samples) < TEMPLATE_SAMPLE_ROWS:
+            return
+        extents = [(min(word[0] for word in column), max(word[1] for word in column))
+                   for column in zip(*self._samples)]
+        # The rows only describe a table if their columns don't overlap
+        if all(a[1] < b[0] for a, b in zip(extents, extents[1:])):
+            self.current = ColumnTemplate(extents)
+            metrics.count("column_templates")
+        else:
+            del self._samples[0]
+
+def _mark_cell(cell):
+    # CCE/ESE/TW cells read like _parse_subject_line's marks
+    if cell is None:
+        return "N/A"
+    value = cell.replace('*', '')
+    if not (value.isdigit() or value == "---"):
+        return "N/A"
+    return f"*{value}" if cell[0] == '*' else value
+
+def _cell_values(cells):
+    # The nine SUBJECT_FIELDS values of a slotted row; empty cells are "N/A"
+    cce, ese, tw, tot, crd, ern_crd, grd, grd_pnt, crd_pnt = cells
+    if tot is not None and tot.startswith('*'):
+        tot = tot[1:]
+    return (_mark_cell(cce), _mark_cell(ese), _mark_cell(tw),
+            *(cell if cell is not None else "N/A" for cell in (tot, crd, ern_crd, grd)),
+            *(cell if cell is not None and cell.isdigit() else "N/A" for cell in (grd_pnt, crd_pnt)))
+
+def _layout_subject_line(words, templates):
+    # Slot a subject row into the current template; rows that don't fit, or
+    # whose grade lands outside the GRD column, are parsed from their tokens
+    template = templates.current
+    if template is not None:
+        cells = template.slot(words[1:])
+        if cells is not None and (cells[COLUMN_LABELS.index("GRD")] in GRADES
+                                  or not any(word in GRADES for _, _, word in words[1:])):
+            return _cell_values(cells)
+        metrics.count("layout_fallbacks")
+    return _parse_subject_line([word for _, _, word in words])
+
+def _parse_page_layout(lines, templates, as_records=False):
+    # Students of one page from iter_lines output, as dicts or StudentRecords
+    page_text = lines_to_text(lines)
+    blocks = _student_blocks(page_text)
+    if not blocks:
+        return []
+    
+    # Header rows anywhere on the page switch templates for the rows below them
+    rows = {}
+    with metrics.span("subject_parsing"):
+        for index, words in enumerate(lines):
+            if templates.see_header(words):
+                continue
+            if len(words) >= 3 and SUBJECT_LINE_PATTERN.match(words[0][2]):
+                templates.see_row(words)
+                rows[index] = (words[0][2], _layout_subject_line(words, templates))
+    
+    students = []
+    for header, student_text, start in blocks:
+        first = page_text.count("\n", 0, start)
+        subject_rows = [rows[i] for i in range(first, first + student_text.count("\n") + 1) if i in rows]
+        metrics.count("subject_lines", len(subject_rows))
+        if as_records:
+            subjects = tuple(SubjectResult.from_values(code, values) for code, values in subject_rows)
+            students.append(StudentRecord(*header, subjects=subjects))
+            continue
+        student_data = dict(zip(BASE_COLUMNS, header))
+        for code, values in subject_rows:
+            _add_subject_columns(student_data, _column_prefix(code), values)
+        students.append(student_data)
+    return students
+
+
+# Compact typed record model
+#
+# The wide dict layout costs nine key strings and nine value strings per
+# subject per student. SubjectResult keeps the same information in slots:
+# marks and points are small ints (shared objects in CPython), the '*' grace
+# marker and '---' placeholder become flag bits, and grades are Grade enum
+# members. to_dict() rebuilds the wide layout exactly.
+
+class Grade(IntEnum):
+    O = 1
+    A_PLUS = 2
+    A = 3
+    B_PLUS = 4
+    B = 5
+    C_PLUS = 6
+    C = 7
+    D = 8
+    E = 9
+    F = 10
+    FFF = 11
+
+    @property
+    def label(self):
+        return GRADE_LABELS[self]
+
+GRADE_CODES = {
+    "O": Grade.O, "A+": Grade.A_PLUS, "A": Grade.A, "B+": Grade.B_PLUS, "B": Grade.B,
+    "C+": Grade.C_PLUS, "C": Grade.C, "D": Grade.D, "E": Grade.E, "F": Grade.F, "FFF": Grade.FFF,
+}
+GRADE_LABELS = {grade: label for label, grade in GRADE_CODES.items()}
+
+# Per-field flag bits; field i of SUBJECT_FIELDS uses bits 2*i and 2*i + 1
+MARK_GRACE = 1  # value had a leading '*'
+MARK_DASH = 2   # value was '---' rather than a number
+
+def _encode_mark(token):
+    # Returns (value, flags) for one wide-layout value
+    if token == "N/A":
+        return None, 0
+    flags = 0
+    body = token
+    if body.startswith('*'):
+        flags = MARK_GRACE
+        body = body[1:]
+    if body == "---":
+        return None, flags | MARK_DASH
+    if body.isascii() and body.isdigit() and (body == "0" or body[0] != "0"):
+        return int(body), flags
+    # Anything unusual (e.g. a mis-aligned token) is kept verbatim
+    return token, 0
+
+def _decode_mark(value, flags):
+    if isinstance(value, str):
+        return value
+    prefix = "*" if flags & MARK_GRACE else ""
+    if value is None:
+        return f"{prefix}---" if flags & MARK_DASH else "N/A"
+    return f"{prefix}{value}"
+
+class SubjectResult:
+    __slots__ = ("code", "is_tw", "cce", "ese", "tw", "tot", "crd", "ern_crd",
+                 "grade", "grade_point", "credit_point", "flags")
+
+    # Slots holding the marks, in SUBJECT_FIELDS order (the grade is separate)
+    MARK_SLOTS = ("cce", "ese", "tw", "tot", "crd", "ern_crd", None, "grade_point", "credit_point")
+
+    @classmethod
+    def from_values(cls, subject_code, values):
+        # Build from a subject code token and the nine wide-layout strings
+        result = cls()
+        result.is_tw = "_TW" in subject_code
+        result.code = sys.intern(subject_code.replace("_TW", "") if result.is_tw else subject_code)
+        flags = 0
+        for i, (slot, token) in enumerate(zip(cls.MARK_SLOTS, values)):
+            if slot is None:
+                result.grade = GRADE_CODES.get(token)
+                continue
+            value, field_flags = _encode_mark(token)
+            setattr(result, slot, value)
+            flags |= field_flags << (2 * i)
+        result.flags = flags
+        return result
+
+    @property
+    def column_prefix(self):
+        return f"{self.code}_TW" if self.is_tw else self.code
+
+    def values(self):
+        # The nine wide-layout strings, in SUBJECT_FIELDS order
+        values = []
+        for i, slot in enumerate(self.MARK_SLOTS):
+            if slot is None:
+                values.append(GRADE_LABELS[self.grade] if self.grade is not None else "N/A")
+            else:
+                values.append(_decode_mark(getattr(self, slot), self.flags >> (2 * i)))
+        return values
+
+    def is_grace(self, field):
+        # field is one of the MARK_SLOTS names, e.g. "cce"
+        return bool(self.flags >> (2 * self.MARK_SLOTS.index(field)) & MARK_GRACE)
+
+    def is_dash(self, field):
+        return bool(self.flags >> (2 * self.MARK_SLOTS.index(field)) & MARK_DASH)
+
+    # Pickle as a plain tuple: records cross process boundaries in parallel mode
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    def __repr__(self):
+        return f"SubjectResult({self.column_prefix!r}, {self.values()!r})"
+
+class StudentRecord:
+    __slots__ = ("prn", "seat_no", "name", "mother_name", "semester", "sgpa",
+                 "credits_earned", "total_credit_points", "subjects")
+
+    def __init__(self, prn, seat_no, name, mother_name, semester, sgpa,
+                 credits_earned, total_credit_points, subjects=()):
+        self.prn = prn
+        self.seat_no = seat_no
+        self.name = name
+        self.mother_name = mother_name
+        self.semester = semester
+        self.sgpa = sgpa
+        self.credits_earned = credits_earned
+        self.total_credit_points = total_credit_points
+        self.subjects = subjects
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    def header(self):
+        return (self.prn, self.seat_no, self.name, self.mother_name, self.semester,
+                self.sgpa, self.credits_earned, self.total_credit_points)
+
+    def to_dict(self):
+        # Backwards-compatible wide layout, identical to extract_tables_from_pdf
+        subjects_data = {}
+        for subject in self.subjects:
+            _add_subject_columns(subjects_data, subject.column_prefix, subject.values())
+        student_data = dict(zip(BASE_COLUMNS, self.header()))
+        student_data.update(subjects_data)
+        return student_data
+
+    def __repr__(self):
+        return f"StudentRecord(prn={self.prn!r}, name={self.name!r}, subjects={len(self.subjects)})"
+
+# Subject column fields, longest first so "_ERN_CRD" wins over "_CRD"
+_FIELDS_BY_LENGTH = sorted(SUBJECT_FIELDS, key=len, reverse=True)
+_FIELD_RANK = {suffix: rank for rank, suffix in enumerate(SUBJECT_FIELDS)}
+_NUMBERED_SUFFIX_PATTERN = re.compile(r"_\d+$")
+
+def _subject_column_key(column):
+    # Sort key grouping subject columns by subject code, then by field in
+    # SUBJECT_FIELDS order (numbered repeats and Term Work columns next to
+    # their field), then by name. Unrecognised columns go last in their group.
+    field_part = _NUMBERED_SUFFIX_PATTERN.sub("", column)
+    rank = len(SUBJECT_FIELDS)
+    for suffix in _FIELDS_BY_LENGTH:
+        if field_part.endswith(suffix):
+            rank = _FIELD_RANK[suffix]
+            break
+    return (column.split('_')[0], rank, column)
+
+def split_subject_column(column):
+    """Split a subject column into (subject, field, repeat), e.g.
+    "AEC-101_TW_TOT_1" -> ("AEC-101_TW", "_TOT", 1); None for other columns.
+
+    subject is the column prefix (Term Work lines keep their "_TW"), field one
+    of SUBJECT_FIELDS and repeat the number of a repeated subject (0 if none).
+    """
+    match = _NUMBERED_SUFFIX_PATTERN.search(column)
+    field_part = column[:match.start()] if match else column
+    for suffix in _FIELDS_BY_LENGTH:
+        if field_part.endswith(suffix) and len(field_part) > len(suffix):
+            repeat = int(match.group()[1:]) if match else 0
+            return field_part[:-len(suffix)], suffix, repeat
+    return None
+
+def order_columns(columns):
+    """Final column order: student columns first, then subject columns grouped by subject"""
+    columns = set(columns)
+    base_columns = [col for col in BASE_COLUMNS if col in columns]
+    subject_columns = sorted((col for col in columns if col not in BASE_COLUMNS), key=_subject_column_key)
+    return base_columns + subject_columns
+
+def _dedupe_key(student_data, dedupe_on):
+    if len(dedupe_on) == 1:
+        return student_data.get(dedupe_on[0])
+    return tuple(student_data.get(col) for col in dedupe_on)
+
+def _unique_students(data_list, dedupe_on=("PRN",)):
+    # Drops duplicate students (same dedupe_on values, first one wins);
+    # returns the kept rows and their positions in data_list
+    seen = set()
+    rows = []
+    index = []
+    for i, student_data in enumerate(data_list):
+        key = _dedupe_key(student_data, dedupe_on)
+        if key in seen:
             continue
+        seen.add(key)
+        rows.append(student_data)
+        index.append(i)
+    return rows, index
+
+def _column_values(rows, columns):
+    # Start every column as all-None and fill in only the keys each student
+    # actually has: linear in the data, not in students x columns
+    column_data = {col: [None] * len(rows) for col in columns}
+    for row, student_data in enumerate(rows):
+        for key, value in student_data.items():
+            column_data[key][row] = value
+    return column_data
+
+def build_students_frame(data_list):
+    """Build the output DataFrame from student dicts without modifying them.
+
+    The column order is worked out once from the union of keys, duplicate PRNs
+    are dropped (first one wins) and the columns are filled in a single pass
+    over the records, with None where a student has no value.
+    """
+    with metrics.span("frame_building"):
+        all_keys = set()
+        for student_data in data_list:
+            all_keys.update(student_data)
+        columns = order_columns(all_keys)
         
-        # Extract subject code (first part)
-        subject_code = parts[0]
+        # Remove any duplicate rows based on PRN, keeping the original row labels
+        rows, index = _unique_students(data_list)
         
-        # Check if this looks like a TW (Term Work) line
-        is_tw_line = "_TW" in subject_code
+        return pd.DataFrame(_column_values(rows, columns), columns=columns,
+                            index=None if len(rows) == len(data_list) else index)
+
+# progress_callback is called as progress_callback(stage, done, total, students)
+# with stage "building" (assembling the DataFrame) and then "writing" (the
+# Excel file), done/total counting students.
+@debug_function
+def save_to_excel(data_list, output_file, progress_callback=None):
+    if not data_list:
+        print("No data to save to Excel.")
+        return None
+    
+    if progress_callback is not None:
+        progress_callback("building", 0, len(data_list), len(data_list))
         
-        # If it's a TW line, we need to handle it differently
-        if is_tw_line:
-            # Extract the base subject code without the _TW suffix
-            base_subject_code = subject_code.replace("_TW", "")
-            # Use a different prefix for these columns
-            column_prefix = f"{base_subject_code}_TW"
-        else:
-            column_prefix = subject_code
+    df = build_students_frame(data_list)
+    
+    if progress_callback is not None:
+        progress_callback("writing", 0, len(df), len(df))
+    
+    try:
+        write_frame_to_excel(df, output_file, progress_callback=progress_callback)
+        print(f"Data saved successfully to {output_file}")
+        print(f"Total number of students processed: {len(df)}")
+    except Exception as e:
+        print(f"Error saving Excel file: {str(e)}")
+    
+    if progress_callback is not None:
+        progress_callback("writing", len(df), len(df), len(df))
+    
+    return df
+
+# Streaming Excel output
+#
+# openpyxl's write-only workbooks serialise each row as it is appended
+# instead of keeping a Cell object per value, so memory stays flat however
+# many students are written.
+
+# Rows between progress_callback calls while writing
+EXCEL_PROGRESS_EVERY = 500
+
+def write_excel_rows(output, columns, rows, sheet_name="Sheet1", total=None, progress_callback=None,
+                     extra_sheets=()):
+    """Write a header and an iterable of row lists to output with a write-only workbook.
+
+    extra_sheets is a sequence of (sheet_name, columns, rows) written after the main sheet.
+    """
+    with metrics.span("excel_writing"):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(sheet_name)
+        ws.append(list(columns))
         
-        # Prepare to extract values
-        cce = "N/A"
-        ese = "N/A"
-        tw = "N/A"
-        tot = "N/A"
-        crd = "N/A"
-        ern_crd = "N/A"
-        grd = "N/A"
-        grd_pnt = "N/A"
-        crd_pnt = "N/A"
+        written = 0
+        for row in rows:
+            ws.append(row)
+            written += 1
+            if progress_callback is not None and written % EXCEL_PROGRESS_EVERY == 0:
+                progress_callback("writing", written, total or written, written)
         
-        try:
-            # Find positions of key markers in the line
-            # Look for grade values which are distinct patterns
-            grade_patterns = ["A+", "A", "B+", "B", "C+", "C", "D", "E", "F", "O", "FFF"]
-            grade_index = -1
-            for i, part in enumerate(parts):
-                if part in grade_patterns:
-                    grade_index = i
-                    grd = part
-                    break
-            
-            if grade_index > 0:
-                # Work backwards and forwards from grade to get other values
-                # Typically grade is followed by grade point and credit point
-                if grade_index + 1 < len(parts) and parts[grade_index + 1].isdigit():
-                    grd_pnt = parts[grade_index + 1]
-                
-                if grade_index + 2 < len(parts) and parts[grade_index + 2].isdigit():
-                    crd_pnt = parts[grade_index + 2]
-                
-                # Credits earned is typically right before grade
-                if grade_index - 1 >= 0:
-                    ern_crd = parts[grade_index - 1]
-                
-                # Credit is typically 2 positions before grade
-                if grade_index - 2 >= 0:
-                    crd = parts[grade_index - 2]
-                
-                # Total is typically 3 positions before grade, but could be "---"
-                if grade_index - 3 >= 0:
-                    tot = parts[grade_index - 3]
-                    if tot.startswith('*'):
-                        tot = tot[1:]  # Remove asterisk
-                
-                # Now work backwards to find ESE, CCE, TW
-                # Look for numeric values or "---" in earlier positions
-                
-                # We'll extract the first few elements after subject code
-                # that are either numeric or "---"
-                value_indices = []
-                for i in range(1, min(grade_index, len(parts))):
-                    value = parts[i].replace('*', '')
-                    if value.isdigit() or value == "---":
-                        value_indices.append(i)
-                
-                # Based on the format in your data, assign values
-                if len(value_indices) >= 1:
-                    idx = value_indices[0]
-                    cce = parts[idx].replace('*', '')
-                    if parts[idx].startswith('*'):
-                        cce = f"*{cce}"
-                
-                if len(value_indices) >= 2:
-                    idx = value_indices[1]
-                    ese = parts[idx].replace('*', '')
-                    if parts[idx].startswith('*'):
-                        ese = f"*{ese}"
-                
-                if len(value_indices) >= 3:
-                    idx = value_indices[2]
-                    tw = parts[idx].replace('*', '')
-                    if parts[idx].startswith('*'):
-                        tw = f"*{tw}"
+        for extra_name, extra_columns, extra_rows in extra_sheets:
+            extra_ws = wb.create_sheet(extra_name)
+            extra_ws.append(list(extra_columns))
+            for row in extra_rows:
+                extra_ws.append(row)
+        
+        wb.save(output)
+    metrics.count("excel_rows", written)
+    return written
+
+def _frame_rows(df):
+    for row in df.itertuples(index=False, name=None):
+        # Missing values must become empty cells, not "nan"
+        yield [None if value is pd.NA or (isinstance(value, float) and value != value) else value
+               for value in row]
+
+def write_frame_to_excel(df, output, sheet_name="Sheet1", progress_callback=None, extra_frames=None):
+    """Write a DataFrame (without its index) to an .xlsx path or file-like object.
+
+    extra_frames maps further sheet names to DataFrames, e.g. ResultAnalytics.summary_sheets().
+    """
+    extra_sheets = [(name, list(frame.columns), _frame_rows(frame)) for name, frame in (extra_frames or {}).items()]
+    return write_excel_rows(output, list(df.columns), _frame_rows(df), sheet_name,
+                            total=len(df), progress_callback=progress_callback, extra_sheets=extra_sheets)
+
+def stream_students_to_excel(students, output_file, sheet_name="Sheet1", progress_callback=None,
+                             dedupe_on=("PRN",)):
+    """Write student records to Excel as they arrive, e.g. straight from iter_students.
+
+    The header needs every column up front, so records are first spooled to a
+    temporary file while the set of columns is collected, then streamed into
+    a write-only workbook. Memory is bounded by the number of columns and
+    PRNs, not by the student records themselves. Duplicate PRNs are dropped
+    like in save_to_excel (dedupe_on names the columns that identify a
+    student). Returns the number of students written.
+    """
+    column_index = {}
+    spooled = 0
+    seen = set()
+    
+    with tempfile.TemporaryFile() as spool:
+        for student_data in students:
+            if isinstance(student_data, StudentRecord):
+                student_data = student_data.to_dict()
+            key = _dedupe_key(student_data, dedupe_on)
+            if key in seen:
+                continue
+            seen.add(key)
             
-            # If we didn't find a grade pattern, try a simpler approach
-            else:
-                # Look for numeric values
-                numeric_indices = []
-                for i, part in enumerate(parts):
-                    clean_part = part.replace('*', '')
-                    if clean_part.isdigit() or clean_part == "---":
-                        numeric_indices.append(i)
-                
-                if len(numeric_indices) >= 3:
-                    # Assume standard order: CCE, ESE, TW, TOT, etc.
-                    cce_idx = numeric_indices[0]
-                    ese_idx = numeric_indices[1]
-                    tw_idx = numeric_indices[2]
-                    
-                    cce = parts[cce_idx].replace('*', '')
-                    ese = parts[ese_idx].replace('*', '')
-                    tw = parts[tw_idx].replace('*', '')
-                    
-                    # Check for asterisks in original values
-                    if parts[cce_idx].startswith('*'):
-                        cce = f"*{cce}"
-                    if parts[ese_idx].startswith('*'):
-                        ese = f"*{ese}"
-                    if parts[tw_idx].startswith('*'):
-                        tw = f"*{tw}"
+            # Spool as (column indices, values) so keys aren't repeated per row
+            indices = []
+            for key in student_data:
+                index = column_index.get(key)
+                if index is None:
+                    index = column_index[key] = len(column_index)
+                indices.append(index)
+            pickle.dump((indices, list(student_data.values())), spool, pickle.HIGHEST_PROTOCOL)
+            spooled += 1
+            if progress_callback is not None and spooled % EXCEL_PROGRESS_EVERY == 0:
+                progress_callback("building", spooled, spooled, spooled)
         
-        except Exception as e:
-            print(f"Error parsing subject line: {line}")
-            print(f"Error details: {str(e)}")
+        if not spooled:
+            print("No data to save to Excel.")
+            return 0
         
-        # Create the keys using the appropriate prefix
-        keys_to_store = {
-            f"{column_prefix}_CCE": cce,
-            f"{column_prefix}_ESE": ese,
-            f"{column_prefix}_TW": tw,
-            f"{column_prefix}_TOT": tot,
-            f"{column_prefix}_CRD": crd,
-            f"{column_prefix}_ERN_CRD": ern_crd,
-            f"{column_prefix}_GRD": grd,
-            f"{column_prefix}_GRD_PNT": grd_pnt,
-            f"{column_prefix}_CRD_PNT": crd_pnt
-        }
+        columns = order_columns(column_index)
+        # Spool column index -> position in the final column order
+        position = {column_index[col]: pos for pos, col in enumerate(columns)}
         
-        # Add keys to subjects_data only if they don't already exist
-        for key, value in keys_to_store.items():
-            if key not in added_keys:
-                subjects_data[key] = value
-                added_keys.add(key)
-            else:
-                # For duplicate keys, append a numeric suffix
-                i = 1
-                new_key = f"{key}_{i}"
-                while new_key in added_keys:
-                    i += 1
-                    new_key = f"{key}_{i}"
-                subjects_data[new_key] = value
-                added_keys.add(new_key)
+        def rows():
+            spool.seek(0)
+            for _ in range(spooled):
+                indices, values = pickle.load(spool)
+                row = [None] * len(columns)
+                for index, value in zip(indices, values):
+                    row[position[index]] = value
+                yield row
+        
+        written = write_excel_rows(output_file, columns, rows(), sheet_name,
+                                   total=spooled, progress_callback=progress_callback)
     
-    return subjects_data
+    if progress_callback is not None:
+        progress_callback("writing", written, written, written)
+    print(f"Data saved successfully to {output_file}")
+    print(f"Total number of students processed: {written}")
+    return written
 
+# Arrow / Parquet output
+#
+# Typed, columnar version of the Excel layout for analytics jobs: marks and
+# points are int16 with nulls for "---"/"N/A", grades are dictionary-encoded,
+# SGPA is a float and "Credits Earned/Total" is split into two ints. Marks
+# that carry the '*' grace marker get a "<column>_GRACE" boolean column
+# right after them (only where the sheet has grace marks at all). Numbers
+# too large for their column type are stored as null, with a printed note.
 
-def save_to_excel(data_list, output_file):
-    if not data_list:
-        print("No data to save to Excel.")
+GRACE_SUFFIX = "_GRACE"
+GRADE_TYPE = pa.dictionary(pa.int8(), pa.string())
+
+def _arrow_int(value):
+    # Unlike _encode_mark, zero-padded tokens ("05", "*07", Semester "01")
+    # are read as numbers here; the typed columns don't round-trip text
+    if value is None or isinstance(value, int):
+        return value
+    body = value[1:] if value.startswith('*') else value
+    return int(body) if body.isascii() and body.isdigit() else None
+
+def _arrow_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
         return None
-        
-    # Handle missing columns across all students by finding all possible columns
+
+def _arrow_grace(value):
+    if value is None or value == "N/A":
+        return None
+    return value.startswith('*')
+
+def _int_array(values, arrow_type, column):
+    # Integers that don't fit arrow_type become nulls (with a note) instead
+    # of failing the whole export
+    info = np.iinfo(arrow_type.to_pandas_dtype())
+    out_of_range = [v for v in values if v is not None and not info.min <= v <= info.max]
+    if out_of_range:
+        print(f"{column}: {len(out_of_range)} values outside the {arrow_type} range stored as null "
+              f"(e.g. {out_of_range[0]})")
+        values = [None if v is not None and not info.min <= v <= info.max else v for v in values]
+    return pa.array(values, arrow_type)
+
+def _split_credits(value):
+    # "20/22" -> (20, 22)
+    earned, _, total = (value or "").partition("/")
+    return _arrow_int(earned), _arrow_int(total)
+
+def students_to_arrow(students, dedupe_on=("PRN",)):
+    """Build a typed pyarrow Table from student dicts or StudentRecords.
+
+    Columns follow the Excel order; duplicate PRNs are dropped like in save_to_excel.
+    """
+    data_list = [s.to_dict() if isinstance(s, StudentRecord) else s for s in students]
+    rows, _ = _unique_students(data_list, dedupe_on)
     all_keys = set()
-    for student_data in data_list:
-        all_keys.update(student_data.keys())
-    
-    # Ensure all students have all columns (even if empty)
-    for student_data in data_list:
-        for key in all_keys:
-            if key not in student_data:
-                student_data[key] = None
-    
-    # Convert to DataFrame and save
-    df = pd.DataFrame(data_list)
-    
-    # Fix duplicate columns BEFORE creating DataFrame
-    all_columns = list(all_keys)
-    
-    # Find and handle duplicate column names
-    seen_columns = set()
-    column_counts = {}
-    
-    for i, col in enumerate(all_columns):
-        if col in seen_columns:
-            # This is a duplicate, rename it with a suffix
-            if col not in column_counts:
-                column_counts[col] = 1
-            column_counts[col] += 1
-            # Create a new column name with a suffix
-            new_col = f"{col}_{column_counts[col]}"
-            
-            # Update the column name in all dictionaries
-            for student_data in data_list:
-                if col in student_data:
-                    # Create a copy with the new name
-                    student_data[new_col] = student_data[col]
-                    # Remove the duplicate key
-                    # We'll keep the first occurrence and rename all others
-                    if column_counts[col] > 1:
-                        student_data.pop(col, None)
+    for student_data in rows:
+        all_keys.update(student_data)
+    columns = order_columns(all_keys)
+    column_data = _column_values(rows, columns)
+    
+    names = []
+    arrays = []
+    for col in columns:
+        values = column_data.pop(col)
+        if col in ("PRN", "Seat No", "Name", "Mother Name"):
+            names.append(col)
+            arrays.append(pa.array(values, pa.string()))
+        elif col == "Semester":
+            names.append(col)
+            arrays.append(_int_array([_arrow_int(v) for v in values], pa.int8(), col))
+        elif col == "SGPA":
+            names.append(col)
+            arrays.append(pa.array([_arrow_float(v) for v in values], pa.float64()))
+        elif col == "Credits Earned/Total":
+            earned, total = zip(*(_split_credits(v) for v in values)) if values else ((), ())
+            names += ["Credits Earned", "Credits Total"]
+            arrays += [_int_array(earned, pa.int16(), "Credits Earned"), _int_array(total, pa.int16(), "Credits Total")]
+        elif col == "Total Credit Points":
+            names.append(col)
+            arrays.append(_int_array([_arrow_int(v) for v in values], pa.int32(), col))
         else:
-            seen_columns.add(col)
-    
-    # Convert to DataFrame after fixing duplicate columns
-    df = pd.DataFrame(data_list)
-    
-    # Reorder columns to put basic info first
-    base_columns = ["PRN", "Seat No", "Name", "Mother Name", "Semester", "SGPA", 
-                    "Credits Earned/Total", "Total Credit Points"]
-    other_columns = [col for col in df.columns if col not in base_columns]
-    
-    # Sort the subject columns for better organization
-    other_columns.sort()
-    
-    # Group columns by subject code
-    subject_codes = set()
-    for col in other_columns:
-        parts = col.split('_')
-        if len(parts) >= 2:
-            subject_codes.add(parts[0])
-    
-    # Reorder columns by grouping them by subject
-    ordered_other_columns = []
-    for subject in sorted(subject_codes):
-        subject_cols = [col for col in other_columns if col.startswith(subject)]
-        # Sort within each subject group: CCE, ESE, TW, TOT, etc.
-        col_order = ["_CCE", "_ESE", "_TW", "_TOT", "_CRD", "_ERN_CRD", "_GRD", "_GRD_PNT", "_CRD_PNT"]
-        # Use a safer sorting method
-        ordered_subject_cols = []
-        for suffix in col_order:
-            for col in subject_cols:
-                if col.endswith(suffix) or any(col.endswith(f"{suffix}_{i}") for i in range(1, 10)):
-                    ordered_subject_cols.append(col)
-        
-        # Add any remaining columns that might not match the expected patterns
-        remaining_cols = [col for col in subject_cols if col not in ordered_subject_cols]
-        ordered_subject_cols.extend(remaining_cols)
-        
-        ordered_other_columns.extend(ordered_subject_cols)
+            rank = _subject_column_key(col)[1]
+            if rank == len(SUBJECT_FIELDS):
+                # Not a recognised subject field: keep it as text
+                names.append(col)
+                arrays.append(pa.array(values, pa.string()))
+            elif SUBJECT_FIELDS[rank] == "_GRD":
+                names.append(col)
+                arrays.append(pa.array([None if v == "N/A" else v for v in values], GRADE_TYPE))
+            else:
+                names.append(col)
+                arrays.append(_int_array([_arrow_int(v) for v in values], pa.int16(), col))
+                grace = [_arrow_grace(v) for v in values]
+                if any(grace):
+                    names.append(col + GRACE_SUFFIX)
+                    arrays.append(pa.array(grace, pa.bool_()))
     
-    # Final column order
-    final_columns = base_columns + ordered_other_columns
+    return pa.Table.from_arrays(arrays, names=names)
+
+def save_to_parquet(students, output_path, partition_by_semester=False, dedupe_on=("PRN",)):
+    """Write students as Parquet; partitioned by Semester, output_path is a dataset directory"""
+    table = students_to_arrow(students, dedupe_on)
+    if table.num_rows == 0:
+        print("No data to save to Parquet.")
+        return table
     
-    # Use only columns that exist in the dataframe
-    existing_columns = [col for col in final_columns if col in df.columns]
-    df = df[existing_columns]
+    if partition_by_semester:
+        pq.write_to_dataset(table, root_path=output_path, partition_cols=["Semester"])
+    else:
+        pq.write_table(table, output_path)
+    print(f"Data saved successfully to {output_path}")
+    print(f"Total number of students processed: {table.num_rows}")
+    return table
+
+# Long subject results
+#
+# The wide layout spends nine mostly-null columns on every subject code any
+# student took (plus _1, _2 copies for repeats). build_results_frame instead
+# gives one row per student per subject line: the student's key columns
+# (dedupe_on), Subject, Term Work, Attempt (0, or n for the _n columns of a
+# repeated subject) and the nine fields under their SUBJECT_FIELDS names.
+# Values are the same strings as in the wide layout; keys and grades are
+# categoricals, so each distinct PRN, code and grade is stored once.
+# results_to_wide pivots the table back into the build_students_frame layout.
+
+RESULT_FIELDS = tuple(suffix[1:] for suffix in SUBJECT_FIELDS)
+GRADE_CATEGORIES = list(GRADE_CODES) + ["N/A"]
+
+def _dict_subject_lines(student_data, split_cache):
+    # (column prefix, attempt, nine values) per subject line of a wide dict;
+    # keys that aren't subject columns (e.g. an added "Remarks") are skipped
+    lines = {}
+    for key, value in student_data.items():
+        if key in BASE_COLUMNS:
+            continue
+        if key in split_cache:
+            parts = split_cache[key]
+        else:
+            parts = split_cache[key] = split_subject_column(key)
+        if parts is None:
+            continue
+        prefix, field, attempt = parts
+        values = lines.get((prefix, attempt))
+        if values is None:
+            values = lines[prefix, attempt] = [None] * len(SUBJECT_FIELDS)
+        values[_FIELD_RANK[field]] = value
+    return [(prefix, attempt, values) for (prefix, attempt), values in lines.items()]
+
+def _record_subject_lines(record):
+    attempts = {}
+    lines = []
+    for subject in record.subjects:
+        prefix = subject.column_prefix
+        attempt = attempts.get(prefix, 0)
+        attempts[prefix] = attempt + 1
+        lines.append((prefix, attempt, subject.values()))
+    return lines
+
+def student_results(record, split_cache=None):
+    """Split a student dict or StudentRecord into (student columns, subject lines).
+
+    The student columns are a dict over BASE_COLUMNS; each subject line is
+    (subject, term_work, attempt, the nine values in SUBJECT_FIELDS order).
+    Pass the same split_cache dict across calls to parse each column name once.
+    """
+    if isinstance(record, StudentRecord):
+        header = dict(zip(BASE_COLUMNS, record.header()))
+        lines = _record_subject_lines(record)
+    else:
+        header = {col: record.get(col) for col in BASE_COLUMNS}
+        lines = _dict_subject_lines(record, {} if split_cache is None else split_cache)
+    return header, [(prefix[:-3], True, attempt, values) if prefix.endswith("_TW") else (prefix, False, attempt, values)
+                    for prefix, attempt, values in lines]
+
+def build_results_frame(data_list, dedupe_on=("PRN",)):
+    """Long subject-result table (one row per student per subject line) from student dicts or StudentRecords.
+
+    Duplicate students are dropped like in build_students_frame.
+    """
+    key_columns = {col: [] for col in dedupe_on}
+    subjects, term_work, attempts = [], [], []
+    field_values = [[] for _ in SUBJECT_FIELDS]
+    split_cache = {}
+    seen = set()
+    
+    for record in data_list:
+        header, lines = student_results(record, split_cache)
+        key = _dedupe_key(header, dedupe_on)
+        if key in seen:
+            continue
+        seen.add(key)
+        for subject, is_tw, attempt, values in lines:
+            for col in dedupe_on:
+                key_columns[col].append(header[col])
+            subjects.append(subject)
+            term_work.append(is_tw)
+            attempts.append(attempt)
+            for column, value in zip(field_values, values):
+                column.append(value)
+    
+    results = {col: pd.Categorical(values) for col, values in key_columns.items()}
+    results["Subject"] = pd.Categorical(subjects)
+    results["Term Work"] = np.array(term_work, dtype=bool)
+    results["Attempt"] = np.array(attempts, dtype=np.int8)
+    for name, values in zip(RESULT_FIELDS, field_values):
+        results[name] = pd.Categorical(values, categories=GRADE_CATEGORIES) if name == "GRD" else pd.array(values, dtype="str")
+    return pd.DataFrame(results)
+
+def results_to_wide(students, results, dedupe_on=("PRN",)):
+    """Pivot a build_results_frame table back to the wide layout.
+
+    students holds the student-level columns (at least dedupe_on), one row per
+    student; it fixes the row order and index. With students =
+    build_students_frame(data)[list(BASE_COLUMNS)] the result equals
+    build_students_frame(data).
+    """
+    dedupe_on = list(dedupe_on)
+    prefix = results["Subject"].astype(str) + np.where(results["Term Work"], "_TW", "")
+    repeat = np.where(results["Attempt"] > 0, "_" + results["Attempt"].astype(str), "")
+    cells = pd.concat([
+        pd.DataFrame({
+            **{col: results[col].astype(students[col].dtype) for col in dedupe_on},
+            "column": prefix + suffix + repeat,
+            "value": results[name].astype(object),
+        })
+        for name, suffix in zip(RESULT_FIELDS, SUBJECT_FIELDS)
+    ], ignore_index=True)
+    wide = cells.pivot(index=dedupe_on, columns="column", values="value")
+    wide = students.join(wide, on=dedupe_on)
+    return wide[order_columns(wide.columns)]
+
+# Incremental re-extraction
+#
+# Republished result PDFs (revaluation, late results) usually differ from
+# the previous version in a handful of pages. extract_incremental keeps a
+# state file with a fingerprint and the parsed students of every page, and
+# on the next version only runs extract_text and the parsers on pages whose
+# fingerprint it hasn't seen. Pages are matched by fingerprint, preferring
+# the page at the same position, so inserted or reordered pages are reused
+# as well. The fingerprint covers everything a page's text can come from:
+# its content streams and its whole resource tree (fonts with their
+# encodings and ToUnicode maps, form XObjects and their own resources).
+# Pages whose resources can't be hashed completely are always re-parsed.
+
+# Bumped when the fingerprint or the state layout changes
+PAGE_STATE_VERSION = 2
+
+class _Unhashable(Exception):
+    pass
+
+def _hash_pdf_object(obj, digest, cache, active):
+    # Feeds a canonical serialisation of obj into digest. Indirect objects
+    # are hashed once per document (cache: objid -> digest); active holds
+    # the objids being hashed, to detect reference cycles.
+    if isinstance(obj, PDFObjRef):
+        objid = obj.objid
+        if objid not in cache:
+            if objid in active:
+                raise _Unhashable(f"reference cycle through object {objid}")
+            active.add(objid)
+            sub_digest = hashlib.sha256()
+            _hash_pdf_object(obj.resolve(), sub_digest, cache, active)
+            active.discard(objid)
+            cache[objid] = sub_digest.digest()
+        digest.update(b"R")
+        digest.update(cache[objid])
+    elif isinstance(obj, PDFStream):
+        digest.update(b"S")
+        _hash_pdf_object(obj.attrs, digest, cache, active)
+        data = obj.get_data()
+        digest.update(b"%d:" % len(data))
+        digest.update(data)
+    elif isinstance(obj, dict):
+        digest.update(b"D%d:" % len(obj))
+        for key in sorted(obj, key=str):
+            digest.update(f"{key}=".encode())
+            _hash_pdf_object(obj[key], digest, cache, active)
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b"L%d:" % len(obj))
+        for item in obj:
+            _hash_pdf_object(item, digest, cache, active)
+    elif isinstance(obj, bytes):
+        digest.update(b"B%d:" % len(obj))
+        digest.update(obj)
+    elif isinstance(obj, (PSLiteral, PSKeyword)):
+        digest.update(f"N{obj.name!r};".encode())
+    elif obj is None or isinstance(obj, (bool, int, float, str)):
+        digest.update(f"V{obj!r};".encode())
+    else:
+        raise _Unhashable(f"unexpected {type(obj).__name__} object")
+
+def page_fingerprint(page, cache=None):
+    """SHA-256 over a page's size, rotation, content streams and resource tree; None if it can't be hashed.
+
+    Pass the same cache dict for every page of a document so shared fonts
+    and XObjects are decoded and hashed once.
+    """
+    page_obj = page.page_obj
+    digest = hashlib.sha256()
+    digest.update(f"{page_obj.mediabox!r};{page_obj.rotate};".encode())
+    cache = {} if cache is None else cache
+    try:
+        _hash_pdf_object(page_obj.resources, digest, cache, set())
+        _hash_pdf_object(list(page_obj.contents), digest, cache, set())
+    except Exception:
+        # Damaged streams, unsupported filters, cycles: nothing to match on
+        return None
+    return digest.hexdigest()
+
+def load_page_state(state_path):
+    """(fingerprint, students) of every page saved by extract_incremental, in page order, or None"""
+    try:
+        with gzip.open(state_path, "rt", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable page state {state_path}: {str(e)}")
+        return None
+    if state.get("parser_version") != PARSER_VERSION or state.get("state_version") != PAGE_STATE_VERSION:
+        return None
+    
+    records = decode_records(state["records"])
+    pages = []
+    position = 0
+    for fingerprint, count in zip(state["fingerprints"], state["counts"]):
+        pages.append((fingerprint, records[position:position + count]))
+        position += count
+    return pages
+
+def _previous_page(previous_pages, by_fingerprint, index, fingerprint):
+    # Students of a page seen in the previous run with this fingerprint: the
+    # page at the same position if it matches, else the first one that does
+    if fingerprint is None or previous_pages is None:
+        return None
+    if index < len(previous_pages) and previous_pages[index][0] == fingerprint:
+        return previous_pages[index][1]
+    return by_fingerprint.get(fingerprint)
+
+def save_page_state(state_path, fingerprints, page_students):
+    records = [student for students in page_students for student in students]
+    state = {
+        "parser_version": PARSER_VERSION,
+        "state_version": PAGE_STATE_VERSION,
+        "fingerprints": fingerprints,
+        "counts": [len(students) for students in page_students],
+        # One shared column table for all pages keeps the file small
+        "records": encode_records(records),
+    }
+    tmp_path = f"{state_path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(tmp_path, state_path)
+
+def _diff_students(old_students, new_students):
+    # PRNs added, removed and changed between two extractions (first record per PRN wins)
+    old_by_prn = {}
+    for student_data in old_students:
+        old_by_prn.setdefault(student_data["PRN"], student_data)
+    new_by_prn = {}
+    for student_data in new_students:
+        new_by_prn.setdefault(student_data["PRN"], student_data)
+    return {
+        "added": [prn for prn in new_by_prn if prn not in old_by_prn],
+        "removed": [prn for prn in old_by_prn if prn not in new_by_prn],
+        "changed": [prn for prn, student_data in new_by_prn.items()
+                    if prn in old_by_prn and old_by_prn[prn] != student_data],
+    }
+
+def extract_incremental(pdf_source, state_path, progress_callback=None):
+    """Extract pdf_source, re-parsing only pages that changed since the last run with this state file.
+
+    Returns (students, report); report holds the added/removed/changed PRNs
+    and how many pages were reused or parsed. The state file is updated.
+    """
+    previous_pages = load_page_state(state_path)
+    by_fingerprint = {}
+    for fingerprint, students in previous_pages or ():
+        if fingerprint is not None:
+            by_fingerprint.setdefault(fingerprint, students)
+    fingerprints = []
+    page_students = []
+    reused = 0
+    hash_cache = {}
     
-    # Double-check for any remaining duplicate columns
-    if len(df.columns) != len(set(df.columns)):
-        # Find duplicates if any remain
-        duplicates = [col for col in df.columns if list(df.columns).count(col) > 1]
-        # Rename duplicates with numbered suffixes
-        for dup in duplicates:
-            dups = [i for i, col in enumerate(df.columns) if col == dup]
-            # Keep the first occurrence, rename others
-            for i, idx in enumerate(dups[1:], 1):
-                df.columns.values[idx] = f"{dup}_{i}"
+    with open_pdf_source(pdf_source) as pdf_file, pdfplumber.open(pdf_file) as pdf:
+        total_pages = len(pdf.pages)
+        students_found = 0
+        for page_num, page in enumerate(pdf.pages, 1):
+            fingerprint = page_fingerprint(page, hash_cache)
+            students = _previous_page(previous_pages, by_fingerprint, page_num - 1, fingerprint)
+            if students is None:
+                print(f"Processing page {page_num} of {total_pages}...")
+                if PAGE_PREFILTER and _skip_page(page.page_obj):
+                    students = []
+                else:
+                    with metrics.span("text_extraction"):
+                        page_text = page.extract_text()
+                    students = _parse_page_text(page_text)
+                page.close()
+            else:
+                reused += 1
+                metrics.count("pages_reused")
+            fingerprints.append(fingerprint)
+            page_students.append(students)
+            students_found += len(students)
+            metrics.count("pages")
+            metrics.count("students", len(students))
+            if progress_callback is not None:
+                progress_callback("extracting", page_num, total_pages, students_found)
     
-    # Remove any duplicate rows based on PRN
-    df.drop_duplicates(subset=["PRN"], keep="first", inplace=True)
+    all_students_data = [student for students in page_students for student in students]
+    old_students = [student for _, students in previous_pages or () for student in students]
+    report = _diff_students(old_students, all_students_data)
+    report["pages_reused"] = reused
+    report["pages_parsed"] = total_pages - reused
+    report["previous_state"] = previous_pages is not None
     
+    save_page_state(state_path, fingerprints, page_students)
+    print(f"Reused {reused} of {total_pages} pages; {len(report['added'])} PRNs added, "
+          f"{len(report['removed'])} removed, {len(report['changed'])} changed")
+    return all_students_data, report
+
+# Batch processing of PDF directories
+#
+# Every PDF is extracted in its own worker process into a per-file part
+# (gzip JSON, same layout as the extraction cache). A line is appended to
+# manifest.jsonl once a part is complete, so a crashed or interrupted run
+# resumes with the files that are still missing. Parts are merged in
+# file-name order at the end, whatever order they finished in.
+
+MANIFEST_FILE = "manifest.jsonl"
+PARTS_DIR = "parts"
+MERGED_BASENAME = "students_data"
+# Students from different PDFs are only duplicates if the semester matches too
+BATCH_DEDUPE_ON = ("PRN", "Semester")
+
+def find_pdfs(input_dir, recursive=False):
+    """PDF paths under input_dir, largest first so long jobs start early"""
+    pdf_paths = []
+    for root, dirs, files in os.walk(input_dir):
+        pdf_paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        if not recursive:
+            break
+    return sorted(pdf_paths, key=lambda path: (-os.path.getsize(path), path))
+
+def _file_signature(pdf_path):
+    stat = os.stat(pdf_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _part_name(relative_path):
+    stem = os.path.splitext(os.path.basename(relative_path))[0]
+    digest = hashlib.sha1(relative_path.encode("utf-8")).hexdigest()[:12]
+    return f"{stem}-{digest}.json.gz"
+
+def write_part(records, part_path):
+    tmp_path = f"{part_path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(encode_records(records), f, separators=(",", ":"))
+    os.replace(tmp_path, part_path)
+
+def read_part(part_path):
+    with gzip.open(part_path, "rt", encoding="utf-8") as f:
+        return decode_records(json.load(f))
+
+def load_manifest(output_dir):
+    """Completed files from an earlier run, keyed by their path relative to the input directory"""
+    entries = {}
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return entries
+    with open(manifest_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A crash can leave a torn last line; that file is simply redone
+                continue
+            entries[entry["file"]] = entry
+    return entries
+
+def _terminate_last_line(manifest_path):
+    # After a crash mid-write the manifest may end in a partial line; start
+    # new entries on a fresh line so they don't get glued onto it
     try:
-        df.to_excel(output_file, index=False)
-        print(f"Data saved successfully to {output_file}")
-        print(f"Total number of students processed: {len(df)}")
-    except Exception as e:
-        print(f"Error saving Excel file: {str(e)}")
+        with open(manifest_path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+    except FileNotFoundError:
+        pass
+
+def _parser_version(layout=False):
+    # Recorded with batch and shard outputs; layout parsing can read rows differently
+    return f"{PARSER_VERSION}-layout" if layout else PARSER_VERSION
+
+def _is_complete(entry, pdf_path, output_dir, layout=False):
+    return (entry is not None
+            and entry.get("parser_version") == _parser_version(layout)
+            and entry.get("size") == os.path.getsize(pdf_path)
+            and entry.get("mtime_ns") == os.stat(pdf_path).st_mtime_ns
+            and os.path.exists(os.path.join(output_dir, entry["part"])))
+
+def _batch_extract_file(pdf_path, part_path, backend=DEFAULT_BACKEND, collect_metrics=False, layout=False):
+    # Runs in a worker process; the per-page progress prints would interleave
+    # across workers, so they are silenced here
+    if collect_metrics:
+        metrics.reset()
+        metrics.enable()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        records = list(iter_students(pdf_path, backend=backend, layout=layout))
+    write_part(records, part_path)
+    return len(records), metrics.summary() if collect_metrics else None
+
+def run_batch(input_dir, output_dir, workers=None, recursive=False, merge=True, parquet=False,
+              backend=DEFAULT_BACKEND, long_results=False, layout=False):
+    """Extract every PDF in input_dir into output_dir, resuming from its manifest.
+
+    Returns the number of files that failed (they are retried on the next run).
+    """
+    pdf_paths = find_pdfs(input_dir, recursive)
+    os.makedirs(os.path.join(output_dir, PARTS_DIR), exist_ok=True)
+    manifest = load_manifest(output_dir)
+    
+    pending = []
+    for pdf_path in pdf_paths:
+        relative_path = os.path.relpath(pdf_path, input_dir)
+        if _is_complete(manifest.get(relative_path), pdf_path, output_dir, layout):
+            continue
+        pending.append((pdf_path, relative_path))
+    print(f"Found {len(pdf_paths)} PDF files, {len(pdf_paths) - len(pending)} already done, {len(pending)} to process")
+    
+    failures = 0
+    if pending:
+        manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+        _terminate_last_line(manifest_path)
+        with ProcessPoolExecutor(max_workers=workers, **worker_pool_options()) as executor, \
+                open(manifest_path, "a", encoding="utf-8") as manifest_file:
+            # Submitted largest first; the pool hands them out in that order
+            futures = {}
+            for pdf_path, relative_path in pending:
+                part = os.path.join(PARTS_DIR, _part_name(relative_path))
+                future = executor.submit(_batch_extract_file, pdf_path, os.path.join(output_dir, part), backend,
+                                         metrics.enabled, layout)
+                futures[future] = (pdf_path, relative_path, part)
+            
+            for done, future in enumerate(as_completed(futures), 1):
+                pdf_path, relative_path, part = futures[future]
+                try:
+                    students, worker_metrics = future.result()
+                except Exception as e:
+                    failures += 1
+                    metrics.count("errors")
+                    print(f"[{done}/{len(pending)}] {relative_path}: failed: {str(e)}")
+                    continue
+                if worker_metrics is not None:
+                    metrics.merge(worker_metrics)
+                entry = {"file": relative_path, "part": part, "students": students,
+                         "parser_version": _parser_version(layout), **_file_signature(pdf_path)}
+                manifest_file.write(json.dumps(entry) + "\n")
+                manifest_file.flush()
+                manifest[relative_path] = entry
+                print(f"[{done}/{len(pending)}] {relative_path}: {students} students")
     
-    return df
\ No newline at end of file
+    if merge:
+        # Files whose extraction failed this run may still have an entry from
+        # an older version of the PDF (or the other parser); leave those out
+        current = sorted((os.path.relpath(path, input_dir), path) for path in pdf_paths)
+        merge_batch(output_dir, [manifest[relative_path] for relative_path, pdf_path in current
+                                 if _is_complete(manifest.get(relative_path), pdf_path, output_dir, layout)],
+                    parquet, long_results)
+    return failures
+
+def merge_batch(output_dir, entries, parquet=False, long_results=False):
+    """Combine the parts listed in entries (in that order) into the merged outputs"""
+    def students():
+        for entry in entries:
+            yield from read_part(os.path.join(output_dir, entry["part"]))
+    
+    excel_path = os.path.join(output_dir, f"{MERGED_BASENAME}.xlsx")
+    stream_students_to_excel(students(), excel_path, dedupe_on=BATCH_DEDUPE_ON)
+    if parquet:
+        save_to_parquet(students(), os.path.join(output_dir, f"{MERGED_BASENAME}.parquet"),
+                        dedupe_on=BATCH_DEDUPE_ON)
+    if long_results:
+        results_path = os.path.join(output_dir, f"{MERGED_BASENAME}_results.parquet")
+        build_results_frame(students(), dedupe_on=BATCH_DEDUPE_ON).to_parquet(results_path, index=False)
+        print(f"Subject results saved to {results_path}")
+
+# Sharded extraction
+#
+# The largest PDFs can be split across machines: each one runs extract_shard
+# on a page range (or shard i of n) and writes a self-describing partial
+# output: gzip JSON holding the records together with the source PDF's
+# SHA-256 and page count, the page span, the parser version and a checksum
+# of the records. merge_shards checks that the partials come from the same
+# PDF and parser, are intact and cover every page exactly once, then
+# concatenates them in page order. Pages are parsed independently, so the
+# result is the record list of a single-node run, and duplicate PRNs are
+# dropped afterwards by save_to_excel exactly as they would be there.
+
+SHARD_FORMAT = "pdf_extractor-shard"
+SHARD_FORMAT_VERSION = 1
+
+def _records_checksum(payload):
+    return hashlib.sha256(json.dumps(payload, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def extract_shard(pdf_source, output_path, start_page=0, end_page=None, shard=None, workers=None,
+                  backend=DEFAULT_BACKEND, layout=False):
+    """Extract a page range (0-based, end exclusive), or shard=(index, count) with a
+    0-based index, of pdf_source into a partial output file.
+
+    Returns the partial's header, i.e. everything in it but the records.
+    """
+    with open_text_backend(pdf_source, backend) as pages:
+        total_pages = len(pages)
+    if shard is not None:
+        start, end = shard_pages(total_pages, *shard)
+    else:
+        start, end = page_span(total_pages, start_page, end_page)
+    
+    records = list(iter_students(pdf_source, workers=workers, backend=backend, start_page=start, end_page=end,
+                                 layout=layout))
+    payload = encode_records(records)
+    header = {
+        "format": SHARD_FORMAT,
+        "format_version": SHARD_FORMAT_VERSION,
+        "source": {
+            "name": os.path.basename(pdf_source) if _is_path(pdf_source) else None,
+            "sha256": hash_pdf(pdf_source),
+            "pages": total_pages,
+        },
+        "parser_version": _parser_version(layout),
+        "backend": backend,
+        "page_start": start,
+        "page_end": end,
+        "shard": list(shard) if shard is not None else None,
+        "students": len(records),
+        "records_sha256": _records_checksum(payload),
+    }
+    tmp_path = f"{output_path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump({**header, "records": payload}, f, separators=(",", ":"))
+    os.replace(tmp_path, output_path)
+    print(f"Pages {start + 1}-{end} of {total_pages}: {len(records)} students written to {output_path}")
+    return header
+
+def read_shard(shard_path):
+    """Return (header, records) of a partial output, verifying its format and records checksum"""
+    with gzip.open(shard_path, "rt", encoding="utf-8") as f:
+        shard = json.load(f)
+    if shard.get("format") != SHARD_FORMAT or shard.get("format_version") != SHARD_FORMAT_VERSION:
+        raise ValueError(f"{shard_path} is not a shard output of this version")
+    payload = shard.pop("records")
+    if _records_checksum(payload) != shard["records_sha256"]:
+        raise ValueError(f"{shard_path} is corrupt: records checksum mismatch")
+    return shard, decode_records(payload)
+
+def merge_shards(shard_paths):
+    """Combine partial outputs into the record list of a single-node run.
+
+    Raises ValueError unless the shards come from the same PDF and parser
+    version and cover all of its pages exactly once.
+    """
+    shards = sorted((read_shard(path) + (path,) for path in shard_paths),
+                    key=lambda shard: (shard[0]["page_start"], shard[0]["page_end"]))
+    if not shards:
+        raise ValueError("No shards to merge")
+    
+    first = shards[0][0]
+    expected_end = 0
+    for header, _, path in shards:
+        if header["source"]["sha256"] != first["source"]["sha256"] or header["source"]["pages"] != first["source"]["pages"]:
+            raise ValueError(f"{path} was extracted from a different PDF")
+        if header["parser_version"] != first["parser_version"]:
+            raise ValueError(f"{path} was extracted with parser version {header['parser_version']}, "
+                             f"not {first['parser_version']}")
+        if header["page_start"] != expected_end:
+            problem = "overlap" if header["page_start"] < expected_end else "gap"
+            raise ValueError(f"Page {problem} before {path}: it starts at page {header['page_start'] + 1}, "
+                             f"expected page {expected_end + 1}")
+        expected_end = header["page_end"]
+    if expected_end != first["source"]["pages"]:
+        raise ValueError(f"Shards end at page {expected_end}, the PDF has {first['source']['pages']} pages")
+    
+    records = []
+    for _, shard_records, _ in shards:
+        records.extend(shard_records)
+    return records
+
+# Command-line interface
+#
+#   python -m pdf_extractor batch <input_dir> -o <output_dir> [-j N] [--parquet] [--long] [--backend pdfminer]
+#   python -m pdf_extractor update <pdf> [--state <file>] [-o <output.xlsx>]
+#   python -m pdf_extractor ingest <pdf>... [--db <file>] [--exam <name>] [--backend pdfminer]
+#   python -m pdf_extractor shard <pdf> -o <part.json.gz> [--start-page N] [--end-page M | --shard I/N]
+#   python -m pdf_extractor merge <part.json.gz>... -o <output.xlsx>
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pdf_extractor",
+                                     description="Extract student data from PDF result sheets")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    batch = commands.add_parser("batch", help="process a directory of PDFs with a worker pool")
+    batch.add_argument("input_dir", help="directory containing the PDF files")
+    batch.add_argument("-o", "--output", required=True, help="output directory (also holds the resume manifest)")
+    batch.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    batch.add_argument("-r", "--recursive", action="store_true", help="also search subdirectories")
+    batch.add_argument("--parquet", action="store_true", help="also write a merged Parquet file")
+    batch.add_argument("--long", action="store_true",
+                       help="also write the long subject-result table (one row per student per subject) as Parquet")
+    batch.add_argument("--no-merge", action="store_true", help="only extract, skip merging the outputs")
+    batch.add_argument("--backend", choices=sorted(TEXT_BACKENDS), default=DEFAULT_BACKEND,
+                       help=f"page text extractor (default: {DEFAULT_BACKEND})")
+    
+    update = commands.add_parser("update", help="re-extract a republished PDF, parsing only changed pages")
+    update.add_argument("pdf", help="the new version of the PDF")
+    update.add_argument("--state", help="page state file (default: <pdf>.pages.json.gz)")
+    update.add_argument("-o", "--output", help="also write the full result to this Excel file")
+    
+    ingest = commands.add_parser("ingest", help="extract PDFs into the SQLite result store")
+    ingest.add_argument("pdfs", nargs="+", help="PDF files, one exam each")
+    ingest.add_argument("--db", help="result store path (default: $RESULT_STORE_PATH or results.sqlite3)")
+    ingest.add_argument("--exam", help="exam name, for a single PDF only (default: each PDF's file name)")
+    ingest.add_argument("--backend", choices=sorted(TEXT_BACKENDS), default=DEFAULT_BACKEND,
+                        help=f"page text extractor (default: {DEFAULT_BACKEND})")
+    
+    shard = commands.add_parser("shard", help="extract a page range or one shard of a PDF into a partial output")
+    shard.add_argument("pdf", help="the PDF file")
+    shard.add_argument("-o", "--output", required=True, help="partial output file (.json.gz)")
+    shard.add_argument("--start-page", type=int, default=1, help="first page to extract, 1-based (default: 1)")
+    shard.add_argument("--end-page", type=int, help="last page to extract, inclusive (default: the last page)")
+    shard.add_argument("--shard", metavar="I/N", help="extract shard I of N (1-based), an even split of the pages")
+    shard.add_argument("-j", "--workers", type=int, default=None, help="worker processes for this shard")
+    shard.add_argument("--backend", choices=sorted(TEXT_BACKENDS), default=DEFAULT_BACKEND,
+                       help=f"page text extractor (default: {DEFAULT_BACKEND})")
+    
+    merge = commands.add_parser("merge", help="combine shard outputs in page order into one Excel file")
+    merge.add_argument("shards", nargs="+", help="partial outputs written by the shard command")
+    merge.add_argument("-o", "--output", required=True, help="merged Excel file")
+    
+    for command in (batch, update, ingest, shard, merge):
+        command.add_argument("--metrics", metavar="FILE", help="write timers and counters for the run as JSON")
+    for command in (batch, ingest, shard):
+        command.add_argument("--layout", action="store_true",
+                             help="read subject rows by column position instead of token order")
+    for command in (batch, update, ingest, shard):
+        command.add_argument("--low-memory", action="store_true",
+                             help="track peak memory and use a fresh worker process per file")
+        command.add_argument("--memory-budget", type=float, metavar="MB",
+                             help="reopen the PDF whenever resident memory exceeds this (implies --low-memory)")
+    
+    args = parser.parse_args(argv)
+    if args.metrics:
+        metrics.reset()
+        metrics.enable()
+    if getattr(args, "low_memory", False) or getattr(args, "memory_budget", None):
+        set_low_memory(True, args.memory_budget)
+    try:
+        if args.command == "batch":
+            failures = run_batch(args.input_dir, args.output, workers=args.workers, recursive=args.recursive,
+                                 merge=not args.no_merge, parquet=args.parquet, backend=args.backend,
+                                 long_results=args.long, layout=args.layout)
+            return 1 if failures else 0
+        if args.command == "update":
+            students, report = extract_incremental(args.pdf, args.state or f"{args.pdf}.pages.json.gz")
+            for kind in ("added", "removed", "changed"):
+                if report[kind]:
+                    print(f"{kind.capitalize()} PRNs: {', '.join(report[kind])}")
+            if args.output:
+                save_to_excel(students, args.output)
+            return 0
+        if args.command == "shard":
+            shard_spec = None
+            if args.shard:
+                if args.start_page != 1 or args.end_page is not None:
+                    parser.error("--shard can't be combined with --start-page/--end-page")
+                try:
+                    index, count = (int(part) for part in args.shard.split("/"))
+                except ValueError:
+                    parser.error(f"--shard expects I/N, got {args.shard!r}")
+                shard_spec = (index - 1, count)
+            try:
+                extract_shard(args.pdf, args.output, start_page=args.start_page - 1, end_page=args.end_page,
+                              shard=shard_spec, workers=args.workers, backend=args.backend, layout=args.layout)
+            except ValueError as e:
+                parser.error(str(e))
+            return 0
+        if args.command == "merge":
+            try:
+                students = merge_shards(args.shards)
+            except ValueError as e:
+                print(f"Cannot merge shards: {str(e)}")
+                return 1
+            save_to_excel(students, args.output)
+            return 0
+        if args.command == "ingest":
+            if args.exam and len(args.pdfs) > 1:
+                parser.error("--exam names a single exam; give one PDF or leave it out to name each after its file")
+            # Imported here: result_store itself imports this module
+            from result_store import RESULT_STORE_PATH, ResultStore
+            store = ResultStore(args.db or RESULT_STORE_PATH)
+            try:
+                for pdf_path in args.pdfs:
+                    students = iter_students(pdf_path, backend=args.backend, layout=args.layout)
+                    exam_id = store.add_exam(students, args.exam or os.path.basename(pdf_path),
+                                             source_hash=hash_pdf(pdf_path))
+                    print(f"{pdf_path}: stored as exam {exam_id}")
+                print(f"Result store {store.path}: {store.stats()['exams']} exams, {store.stats()['students']} students")
+            finally:
+                store.close()
+            return 0
+    finally:
+        if args.metrics:
+            metrics.write_json(args.metrics)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+# result_store.py
+import os
+import sqlite3
+import threading
+import time
+from itertools import islice
+
+import pandas as pd
+
+from pdf_extractor import RESULT_FIELDS, student_results
+
+# Location of the store; can be overridden from the environment for deployments
+RESULT_STORE_PATH = os.environ.get("RESULT_STORE_PATH", "results.sqlite3")
+
+# Rows per executemany call while ingesting
+INSERT_BATCH_SIZE = 5000
+
+# Seconds a writer waits for another connection's transaction to finish
+BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exams (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    source_hash TEXT UNIQUE,
+    imported_at REAL NOT NULL,
+    students INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    exam_id INTEGER NOT NULL REFERENCES exams(id) ON DELETE CASCADE,
+    prn TEXT,
+    seat_no TEXT,
+    name TEXT,
+    mother_name TEXT,
+    semester TEXT,
+    sgpa TEXT,
+    credits_earned TEXT,
+    total_credit_points TEXT
+);
+CREATE TABLE IF NOT EXISTS subject_results (
+    student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    subject TEXT NOT NULL,
+    term_work INTEGER NOT NULL,
+    attempt INTEGER NOT NULL,
+    cce TEXT, ese TEXT, tw TEXT, tot TEXT, crd TEXT, ern_crd TEXT, grd TEXT, grd_pnt TEXT, crd_pnt TEXT
+);
+CREATE INDEX IF NOT EXISTS students_prn ON students(prn);
+CREATE INDEX IF NOT EXISTS students_seat_no ON students(seat_no);
+CREATE INDEX IF NOT EXISTS students_semester ON students(semester);
+CREATE INDEX IF NOT EXISTS students_exam ON students(exam_id);
+CREATE INDEX IF NOT EXISTS subject_results_subject ON subject_results(subject);
+CREATE INDEX IF NOT EXISTS subject_results_student ON subject_results(student_id);
+"""
+
+STUDENT_COLUMNS = ("prn", "seat_no", "name", "mother_name", "semester", "sgpa",
+                   "credits_earned", "total_credit_points")
+RESULT_COLUMNS = tuple(field.lower() for field in RESULT_FIELDS)
+
+# Student columns shown by the query helpers, with the exam they belong to
+_STUDENT_SELECT = (
+    "SELECT s.id AS student_id, e.name AS exam, "
+    + ", ".join(f"s.{col}" for col in STUDENT_COLUMNS)
+    + " FROM students s JOIN exams e ON e.id = s.exam_id"
+)
+
+
+def _contains_pattern(term):
+    # LIKE pattern matching term anywhere, with its own '%' and '_' taken literally
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class ResultStore:
+    """SQLite store of extracted results across exams, for PRN, seat number and subject lookups.
+
+    One exam is one extracted PDF (or batch). Ingesting is a single
+    transaction with batched executemany inserts; re-ingesting a source with
+    the same source_hash replaces its exam. The connection is shared by
+    threads behind a lock, so one instance can serve every app session.
+    """
+
+    def __init__(self, path=RESULT_STORE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode = WAL")
+                self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def add_exam(self, students, name, source_hash=None, dedupe_on=("PRN",)):
+        """Ingest student dicts or StudentRecords as one exam and return its id.
+
+        Duplicate students (same dedupe_on values) are dropped, first one wins.
+        students may be a lazy iterator (e.g. iter_students); it is consumed
+        before the write transaction starts, so the database is only locked
+        while the rows are inserted, not while the PDF is parsed.
+        """
+        split_cache = {}
+        seen = set()
+        parsed = []
+        for record in students:
+            header, lines = student_results(record, split_cache)
+            key = tuple(header[col] for col in dedupe_on)
+            if key in seen:
+                continue
+            seen.add(key)
+            parsed.append((tuple(header.values()), lines))
+        
+        student_sql = (f"INSERT INTO students (id, exam_id, {', '.join(STUDENT_COLUMNS)}) "
+                       f"VALUES ({', '.join('?' * (len(STUDENT_COLUMNS) + 2))})")
+        result_sql = (f"INSERT INTO subject_results (student_id, subject, term_work, attempt, {', '.join(RESULT_COLUMNS)}) "
+                      f"VALUES ({', '.join('?' * (len(RESULT_COLUMNS) + 4))})")
+
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if source_hash is not None:
+                    cursor.execute("DELETE FROM exams WHERE source_hash = ?", (source_hash,))
+                cursor.execute("INSERT INTO exams (name, source_hash, imported_at) VALUES (?, ?, ?)",
+                               (name, source_hash, time.time()))
+                exam_id = cursor.lastrowid
+                # Ids are handed out here so subject rows can reference their
+                # student without a round trip per insert
+                first_id = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM students").fetchone()[0]
+                student_rows = ((student_id, exam_id, *header)
+                                for student_id, (header, _) in enumerate(parsed, first_id))
+                result_rows = ((student_id, subject, int(is_tw), attempt, *values)
+                               for student_id, (_, lines) in enumerate(parsed, first_id)
+                               for subject, is_tw, attempt, values in lines)
+                for batch in _batches(student_rows, INSERT_BATCH_SIZE):
+                    cursor.executemany(student_sql, batch)
+                for batch in _batches(result_rows, INSERT_BATCH_SIZE):
+                    cursor.executemany(result_sql, batch)
+                cursor.execute("UPDATE exams SET students = ? WHERE id = ?", (len(parsed), exam_id))
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        return exam_id
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def exams(self):
+        """All exams, newest first"""
+        return self._query("SELECT id, name, source_hash, datetime(imported_at, 'unixepoch') AS imported_at, students "
+                           "FROM exams ORDER BY imported_at DESC")
+
+    def find_students(self, prn=None, seat_no=None, name=None, semester=None, exam_id=None, limit=200):
+        """Students matching every given filter; name matches any part, case-insensitively"""
+        conditions = []
+        params = []
+        for column, value in (("s.prn", prn), ("s.seat_no", seat_no), ("s.semester", semester), ("s.exam_id", exam_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if name:
+            conditions.append("s.name LIKE ? ESCAPE '\\'")
+            params.append(_contains_pattern(name))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(f"{_STUDENT_SELECT}{where} ORDER BY s.prn, s.semester, e.imported_at LIMIT ?",
+                           (*params, limit))
+
+    def search(self, term, limit=50):
+        """Students whose PRN or seat number equals term, or whose name contains it"""
+        term = term.strip()
+        if not term:
+            return self.find_students(limit=0)
+        # Separate branches so the PRN and seat number lookups use their indexes
+        sql = (f"{_STUDENT_SELECT} WHERE s.prn = ? UNION "
+               f"{_STUDENT_SELECT} WHERE s.seat_no = ? UNION "
+               f"{_STUDENT_SELECT} WHERE s.name LIKE ? ESCAPE '\\' "
+               "ORDER BY prn, semester LIMIT ?")
+        return self._query(sql, (term, term, _contains_pattern(term), limit))
+
+    def student_history(self, prn):
+        """Every subject result of a PRN across all exams and semesters"""
+        return self._query(
+            f"SELECT e.name AS exam, s.semester, s.sgpa, r.subject, r.term_work, r.attempt, "
+            f"{', '.join('r.' + col for col in RESULT_COLUMNS)} "
+            "FROM students s JOIN exams e ON e.id = s.exam_id JOIN subject_results r ON r.student_id = s.id "
+            "WHERE s.prn = ? ORDER BY e.imported_at, s.semester, r.rowid",
+            (prn,))
+
+    def subject_results(self, subject, semester=None, exam_id=None):
+        """Results of one subject code, optionally for one semester or exam"""
+        conditions = ["r.subject = ?"]
+        params = [subject]
+        if semester is not None:
+            conditions.append("s.semester = ?")
+            params.append(semester)
+        if exam_id is not None:
+            conditions.append("s.exam_id = ?")
+            params.append(exam_id)
+        return self._query(
+            f"SELECT e.name AS exam, s.prn, s.seat_no, s.name, s.semester, r.term_work, r.attempt, "
+            f"{', '.join('r.' + col for col in RESULT_COLUMNS)} "
+            "FROM subject_results r JOIN students s ON s.id = r.student_id JOIN exams e ON e.id = s.exam_id "
+            f"WHERE {' AND '.join(conditions)} ORDER BY s.prn",
+            params)
+
+    def stats(self):
+        with self._lock:
+            exams, students = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(students), 0) FROM exams").fetchone()
+        return {"exams": exams, "students": students}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()